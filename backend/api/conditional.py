@@ -0,0 +1,39 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers
+)
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Слабый ETag из произвольных составляющих."""
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    """
+    Отвечает 304 Not Modified, если данные у клиента не устарели,
+    иначе вызывает get_response. В ответ добавляются валидаторы.
+    """
+    last_modified = int(last_modified)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = get_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response,
+            no_cache=True,
+            private=request.user.is_authenticated
+        )
+        patch_vary_headers(response, ('Authorization',))
+    return response
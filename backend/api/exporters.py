@@ -0,0 +1,37 @@
+import csv
+
+
+class Echo:
+    """Псевдо-буфер, отдающий записанную строку вместо её хранения."""
+
+    def write(self, value):
+        return value
+
+
+def txt_export(ingredients):
+    """Построчно формирует список покупок в текстовом виде."""
+    yield 'Список покупок \n'
+    for ingredient in ingredients:
+        yield (
+            f"{ingredient['name']} - "
+            f"{ingredient['amount']} "
+            f"{ingredient['measurement_unit']}\n"
+        )
+
+
+def csv_export(ingredients):
+    """Построчно формирует список покупок в формате CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['name'],
+            ingredient['amount'],
+            ingredient['measurement_unit'],
+        ))
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', txt_export),
+    'csv': ('text/csv; charset=utf-8', csv_export),
+}
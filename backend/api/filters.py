@@ -1,14 +1,23 @@
+from django.db.models import (
+    Case, Exists, IntegerField,
+    OuterRef, Value, When
+)
+from django.db.models.functions import Lower
 from django_filters import rest_framework
-from recipes.models import Recipe, Tag, Ingredient
+from recipes import catalog, search
+from recipes.models import Recipe, Tag, TagRecipe, Ingredient
+
+
+def tag_choices():
+    return [(slug, slug) for slug in catalog.get_index(Tag, 'slug')]
 
 
 class RecipeFilter(rest_framework.FilterSet):
-    """Фильтрация рецептов по тегам и автору."""
+    """Фильтрация рецептов по тегам, автору и полнотекстовый поиск."""
 
-    tags = rest_framework.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
+    tags = rest_framework.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags'
     )
     author = rest_framework.CharFilter(field_name='author__id')
     is_favorited = rest_framework.CharFilter(
@@ -18,12 +27,35 @@ class RecipeFilter(rest_framework.FilterSet):
     is_in_shopping_cart = rest_framework.CharFilter(
         method='filter_shopping_cart',
     )
+    search = rest_framework.CharFilter(method='filter_search')
+    ordering = rest_framework.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = (
             'tags', 'author',
-            'is_favorited', 'is_in_shopping_cart'
+            'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering'
+        )
+
+    def filter_tags(self, queryset, name, value):
+        slugs = catalog.get_index(Tag, 'slug')
+        return queryset.filter(Exists(TagRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[slugs[slug] for slug in value if slug in slugs]
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return search.search(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        # Оценка есть у каждого рецепта: внутреннее соединение
+        # и порядок полей индекса recipescore_<value>_idx.
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', '-score__recipe_id'
         )
 
     def filter_shopping_cart(self, queryset, name, value):
@@ -36,13 +68,35 @@ class RecipeFilter(rest_framework.FilterSet):
 
 
 class IngredientFilter(rest_framework.FilterSet):
-    """Фильтрация ингредиентов по названию."""
+    """
+    Фильтрация ингредиентов по названию.
+    name - поиск по началу названия без учёта регистра,
+    search - автодополнение: сначала совпадения по началу,
+    затем по вхождению в название.
+    """
 
-    name = rest_framework.CharFilter(
-        field_name='name',
-        lookup_expr='startswith'
-    )
+    name = rest_framework.CharFilter(method='filter_name')
+    search = rest_framework.CharFilter(method='filter_search')
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'search')
+
+    def filter_name(self, queryset, name, value):
+        return queryset.annotate(
+            name_lower=Lower('name')
+        ).filter(name_lower__startswith=value.lower())
+
+    def filter_search(self, queryset, name, value):
+        value = value.lower()
+        return queryset.annotate(
+            name_lower=Lower('name')
+        ).filter(
+            name_lower__contains=value
+        ).annotate(
+            is_prefix=Case(
+                When(name_lower__startswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('is_prefix', 'name')
@@ -0,0 +1,13 @@
+from rest_framework import pagination
+
+
+class RecipeCursorPagination(pagination.CursorPagination):
+    """
+    Курсорная пагинация ленты рецептов по убыванию id.
+    Не считает общее количество и не использует OFFSET,
+    поэтому время ответа не зависит от глубины страницы.
+    """
+
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = 100
@@ -1,10 +1,17 @@
 import base64
+import binascii
 import re
+import tempfile
+from collections.abc import Mapping
 
 from rest_framework import serializers
 from rest_framework.relations import PrimaryKeyRelatedField, SlugRelatedField
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.base import File
+from django.db import transaction
 
+from backend.metrics import TimedSerializerMixin
+from recipes import bulk, cart, catalog, images, ingredient_index
 from recipes.models import (
     User,
     Recipe,
@@ -16,20 +23,98 @@ from recipes.models import (
     IngredientRecipe,
 )
 
+RECIPES_LIMIT = 3
+BATCH_LIMIT = 100
+
+
+def get_recipes_limit(request):
+    """Количество рецептов автора из параметра recipes_limit."""
+    try:
+        return max(
+            int(request.query_params.get('recipes_limit', RECIPES_LIMIT)), 0
+        )
+    except ValueError:
+        return RECIPES_LIMIT
+
 
 class Base64ImageField(serializers.ImageField):
+    """
+    Изображение в base64. Декодируется частями во временный файл,
+    который при большом размере сбрасывается из памяти на диск.
+    """
+
+    chunk_size = 64 * 1024
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, separator, imgstr = data.partition(';base64,')
+            if not separator:
+                self.fail('invalid_image')
             ext = format.split('/')[-1]
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            file = tempfile.SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+            )
+            try:
+                for start in range(0, len(imgstr), self.chunk_size):
+                    file.write(base64.b64decode(
+                        imgstr[start:start + self.chunk_size],
+                        validate=True
+                    ))
+            except binascii.Error:
+                file.close()
+                self.fail('invalid_image')
+            file.seek(0)
+            data = File(file, name='temp.' + ext)
 
         return super().to_internal_value(data)
 
 
-class TagSerializer(serializers.ModelSerializer):
+def parse_ids(values):
+    """Целые id из списка значений; остальные значения пропускаются."""
+    ids = set()
+    if isinstance(values, list):
+        for value in values:
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                pass
+    return ids
+
+
+class CatalogPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """
+    Проверяет первичный ключ по кэшу справочника, а не запросом к БД.
+    Объекты, заранее загруженные сериализатором в context['catalog'],
+    берутся оттуда без обращения к кэшу.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        model = self.queryset.model
+        objects = self.context.get('catalog', {}).get(model)
+        if objects is None:
+            objects = catalog.get_objects(model, [pk])
+        instance = objects.get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class TimedSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Сериалазер, время которого учитывается в метриках запроса."""
+
+
+class TimedModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """ModelSerializer, время которого учитывается в метриках запроса."""
+
+
+class TagSerializer(TimedModelSerializer):
     """Сериалазер для тегов."""
 
     class Meta:
@@ -37,7 +122,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'slug', 'color')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedModelSerializer):
     """Сериалазер для ингредиентов."""
 
     class Meta:
@@ -45,7 +130,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class GetIngredientRecipeSerializer(serializers.ModelSerializer):
+class GetIngredientRecipeSerializer(TimedModelSerializer):
     """Сериалазер для GET запросов к связной модели ингредиента и рецепта."""
 
     id = serializers.ReadOnlyField(source='ingredients.id')
@@ -64,10 +149,10 @@ class GetIngredientRecipeSerializer(serializers.ModelSerializer):
         )
 
 
-class PostIngredientRecipeSerializer(serializers.ModelSerializer):
+class PostIngredientRecipeSerializer(TimedModelSerializer):
     """Сериалазер для POST запросов к связной модели ингредиента и рецепта."""
 
-    id = serializers.PrimaryKeyRelatedField(
+    id = CatalogPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
     )
     amount = serializers.IntegerField(min_value=1,)
@@ -80,7 +165,7 @@ class PostIngredientRecipeSerializer(serializers.ModelSerializer):
         )
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedModelSerializer):
     """Сериалазер для пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -99,14 +184,16 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context['request'].user
-        following = list(obj.following.values_list('user', flat=True))
-        return (
-            user.is_authenticated
-            and user.id in following
-        )
+        # В общей для всех пользователей части ответа флаг
+        # проставляется позже, отдельно для каждого пользователя.
+        if not user.is_authenticated or self.context.get('shared'):
+            return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.following.filter(user=user).exists()
 
 
-class GetRecipeSerializer(serializers.ModelSerializer):
+class GetRecipeSerializer(TimedModelSerializer):
     """Сериалазер для GET запросов рецепта."""
 
     author = UserSerializer(many=False,)
@@ -123,34 +210,53 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'name', 'author',
-            'image', 'tags', 'text',
+            'image', 'image_thumbnail', 'image_webp',
+            'tags', 'text',
             'ingredients', 'cooking_time',
             'is_in_shopping_cart', 'is_favorited'
         )
+        read_only_fields = ('image_thumbnail', 'image_webp')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
-        followers = list(obj.favorite_follower.values_list('user', flat=True))
         return (
             user.is_authenticated
-            and user.id in followers
+            and obj.favorite_follower.filter(user=user).exists()
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
-        shoppers = list(obj.shopper.values_list('user', flat=True))
         return (
             user.is_authenticated
-            and user.id in shoppers
+            and obj.shopper.filter(user=user).exists()
+        )
+
+
+class CookableRecipeSerializer(GetRecipeSerializer):
+    """
+    Рецепт в подборке по имеющимся ингредиентам:
+    coverage - доля ингредиентов рецепта, которые есть у пользователя.
+    """
+
+    matched_count = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(GetRecipeSerializer.Meta):
+        fields = GetRecipeSerializer.Meta.fields + (
+            'ingredients_count', 'matched_count', 'coverage'
         )
 
 
-class PostRecipeSerializer(serializers.ModelSerializer):
+class PostRecipeSerializer(TimedModelSerializer):
     """Сериалазер для POST и PATCH запросов рецепта."""
 
     author = SlugRelatedField(slug_field='username', read_only=True)
     image = Base64ImageField(required=False, allow_null=True)
-    tags = PrimaryKeyRelatedField(
+    tags = CatalogPrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         required=True
@@ -169,61 +275,160 @@ class PostRecipeSerializer(serializers.ModelSerializer):
             'ingredients', 'cooking_time'
         )
 
+    def to_internal_value(self, data):
+        # Все id тегов и ингредиентов проверяются двумя чтениями
+        # из кэша справочников, а не чтением на каждый id.
+        if isinstance(data, Mapping):
+            ingredients = data.get('ingredients')
+            if isinstance(ingredients, list):
+                ingredients = [
+                    item.get('id') for item in ingredients
+                    if isinstance(item, Mapping)
+                ]
+            self.context['catalog'] = {
+                Tag: catalog.get_objects(Tag, parse_ids(data.get('tags'))),
+                Ingredient: catalog.get_objects(
+                    Ingredient, parse_ids(ingredients)
+                ),
+            }
+        return super().to_internal_value(data)
+
     def validate(self, data):
         tpl = r'^[-a-zA-Zа-яА-ЯЁё\s]*$'
-        if re.fullmatch(tpl, data['name']) is None:
+        if re.fullmatch(tpl, data.get('name', '')) is None:
             raise serializers.ValidationError(
                 'Название может состоять только из букв и пробелов!')
+        ingredients = [
+            ingredient['id'] for ingredient in data.get(
+                'recipe_ingredients', []
+            )
+        ]
+        if len(ingredients) != len(set(ingredients)):
+            raise serializers.ValidationError(
+                'Ингредиенты рецепта не должны повторяться!')
         return data
 
+    def set_ingredients(self, recipe, ingredients, created=False):
+        """
+        Сохраняет ингредиенты рецепта пачкой:
+        добавляет новые, обновляет изменившееся количество
+        и удаляет убранные из рецепта, затем по всем изменениям сразу
+        обновляет индекс ингредиентов и суммы списков покупок.
+        """
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        existing = {}
+        if not created:
+            existing = {
+                item.ingredients_id: item
+                for item in IngredientRecipe.objects.filter(recipe=recipe)
+            }
+
+        removed = bulk.delete(
+            IngredientRecipe, ('ingredients', 'amount'), id=[
+                item.id for ingredient_id, item in existing.items()
+                if ingredient_id not in amounts
+            ]
+        )
+        cart_changes = {
+            ingredient_id: -amount for ingredient_id, amount in removed
+        }
+
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                cart_changes[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+
+        added = [
+            ingredient_id for ingredient_id in amounts
+            if ingredient_id not in existing
+        ]
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe,
+                ingredients_id=ingredient_id,
+                amount=amounts[ingredient_id]
+            )
+            for ingredient_id in added
+        )
+        # Пакетные запросы не отправляют сигналы, поэтому индекс
+        # и суммы списков покупок обновляются здесь.
+        ingredient_index.change(
+            recipe.id, added, [ingredient_id for ingredient_id, _ in removed]
+        )
+        if not created:
+            cart_changes.update(
+                (ingredient_id, amounts[ingredient_id])
+                for ingredient_id in added
+            )
+            cart.change_recipe(recipe.id, cart_changes)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(**validated_data)
-
-        for ingredient in ingredients:
-            IngredientRecipe.objects.create(
-                recipe=recipe,
-                ingredients=ingredient['id'],
-                amount=ingredient['amount']
-            ).save()
+        self.set_ingredients(recipe, ingredients, created=True)
         recipe.tags.set(tags)
+        if recipe.image:
+            images.schedule(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
         instance.text = validated_data.get('text', instance.text)
+        if 'image' in validated_data:
+            images.release_on_commit(
+                getattr(instance, field).name for field in images.IMAGE_FIELDS
+            )
+            instance.image = validated_data['image']
+            instance.image_thumbnail = None
+            instance.image_webp = None
+            if instance.image:
+                images.schedule(instance.id)
+        instance.cooking_time = validated_data.get(
+            'cooking_time', instance.cooking_time
+        )
 
-        ingredients = validated_data.pop('recipe_ingredients')
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        for ingredient in ingredients:
-            IngredientRecipe.objects.create(
-                recipe=instance,
-                ingredients=ingredient['id'],
-                amount=ingredient['amount']
-            ).save()
-
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.save()
+        ingredients = validated_data.pop('recipe_ingredients', None)
+        if ingredients is not None:
+            self.set_ingredients(instance, ingredients)
+
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        update_fields = ['name', 'text', 'cooking_time', 'updated_at']
+        if 'image' in validated_data:
+            update_fields += ['image', 'image_thumbnail', 'image_webp']
+        instance.save(update_fields=update_fields)
         return instance
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedModelSerializer):
     """Сериалазер для рецепта без связанных полей."""
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = (
+            'id', 'name', 'image',
+            'image_thumbnail', 'cooking_time'
+        )
+        read_only_fields = ('image_thumbnail',)
 
 
-class GetFollowSerializer(serializers.ModelSerializer):
+class GetFollowSerializer(UserSerializer):
     """Сериалазер для GET запросов к подпискам."""
 
     recipes = serializers.SerializerMethodField()
-    is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -235,25 +440,20 @@ class GetFollowSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes(self, obj):
-        recipes = list(obj.recipes.all())
-        if len(recipes) >= 3:
-            recipes = recipes[:3]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()[
+                :get_recipes_limit(self.context['request'])
+            ]
         return RecipeSerializer(
             recipes,
             many=True,
             context=self.context
         ).data
 
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        following = list(obj.following.values_list('user', flat=True))
-        return (
-            user.is_authenticated
-            and user.id in following
-        )
-
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(TimedModelSerializer):
     """Сериалазер для подписк."""
 
     class Meta:
@@ -274,7 +474,7 @@ class FollowSerializer(serializers.ModelSerializer):
         return GetFollowSerializer(instance.author, context=self.context).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(TimedModelSerializer):
     """Сериалазер для избранного."""
 
     class Meta:
@@ -286,7 +486,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         return RecipeSerializer(instance.recipe, context=self.context).data
 
 
-class ShoppingListSerializer(serializers.ModelSerializer):
+class ShoppingListSerializer(TimedModelSerializer):
     """Сериалазер для списка покупок."""
 
     class Meta:
@@ -296,3 +496,25 @@ class ShoppingListSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         return RecipeSerializer(instance.recipe, context=self.context).data
+
+
+class CartTotalSerializer(TimedSerializer):
+    """Сериалайзер строки сводки списка покупок."""
+
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
+    amount = serializers.IntegerField()
+
+
+class BatchSerializer(TimedSerializer):
+    """Список id для пакетного добавления и удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -13,8 +13,13 @@ router.register('recipes', views.RecipeViewSet)
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
-    path('users/subscriptions/', views.APIMyUser.as_view()),
+    path('users/subscriptions/', views.APIMyUser.as_view(),
+         name='subscriptions'),
+    path('users/feed/', views.APIFeed.as_view(), name='feed'),
+    path('users/subscribe_batch/', views.APIFollowBatch.as_view(),
+         name='subscribe-batch'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
-    path('users/<int:id>/subscribe/', views.APIFollow.as_view()),
+    path('users/<int:id>/subscribe/', views.APIFollow.as_view(),
+         name='subscribe'),
 ]
@@ -1,5 +1,14 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import (
+    BooleanField, CharField, Exists, F,
+    OuterRef, Prefetch, Subquery, Value
+)
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
+from django.http import Http404, StreamingHttpResponse
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
@@ -12,32 +21,173 @@ from rest_framework.views import APIView
 
 from .serializers import (
     GetRecipeSerializer,
+    CookableRecipeSerializer,
     PostRecipeSerializer,
     IngredientSerializer,
     TagSerializer,
     FollowSerializer,
     FavoriteSerializer,
     ShoppingListSerializer,
-    GetFollowSerializer
+    CartTotalSerializer,
+    BatchSerializer,
+    GetFollowSerializer,
+    get_recipes_limit
 )
+from .conditional import conditional_response, make_etag
+from .exporters import EXPORT_FORMATS
+from .pagination import RecipeCursorPagination
 from .permissions import IsAuthorPermission
 from .filters import RecipeFilter, IngredientFilter
+from backend.metrics import registry
+from recipes import batch, catalog, feed, ingredient_index, versions
 from recipes.models import (
     User,
     Recipe,
     Ingredient,
     Tag,
-    IngredientRecipe,
     Favorite,
     ShoppingList,
+    CartTotal,
     Follow
 )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+def batch_response(request, model):
+    """
+    Добавляет (POST) или удаляет (DELETE) связи пользователя
+    с объектами из {"ids": [...]} и отдаёт статус по каждому id.
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    handle = batch.add if request.method == 'POST' else batch.remove
+    return Response(
+        handle(model, request.user, serializer.validated_data['ids'])
+    )
+
+
+def recipe_queryset(user):
+    """Рецепты со связанными данными и флагами для пользователя."""
+    # Поисковый вектор нужен только в SQL поиска, в ответ он не входит.
+    queryset = Recipe.objects.defer('search_vector').prefetch_related(
+        'tags', 'recipe_ingredients__ingredients'
+    )
+    if not user.is_authenticated:
+        return queryset.select_related('author').annotate(
+            is_favorited=Value(False, output_field=BooleanField()),
+            is_in_shopping_cart=Value(False, output_field=BooleanField())
+        )
+    return queryset.prefetch_related(
+        Prefetch(
+            'author',
+            queryset=User.objects.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('pk')
+                ))
+            )
+        )
+    ).annotate(
+        is_favorited=Exists(Favorite.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )),
+        is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ))
+    )
+
+
+def get_user_state(user, recipe_ids, author_ids):
+    """
+    Одним запросом находит среди переданных рецепты в избранном
+    и в списке покупок пользователя и авторов, на которых он подписан.
+    """
+    def part(model, kind, field, ids):
+        return model.objects.filter(
+            user=user, **{f'{field}__in': ids}
+        ).order_by().annotate(
+            kind=Value(kind, output_field=CharField()),
+            object_id=F(field)
+        ).values_list('kind', 'object_id')
+
+    state = {'favorite': set(), 'cart': set(), 'follow': set()}
+    rows = part(Favorite, 'favorite', 'recipe_id', recipe_ids).union(
+        part(ShoppingList, 'cart', 'recipe_id', recipe_ids),
+        part(Follow, 'follow', 'author_id', author_ids),
+        all=True
+    )
+    for kind, object_id in rows:
+        state[kind].add(object_id)
+    return state
+
+
+def apply_user_state(user, recipes):
+    """Проставляет флаги пользователя в сериализованные рецепты."""
+    if not recipes:
+        return
+    state = get_user_state(
+        user,
+        {recipe['id'] for recipe in recipes},
+        {recipe['author']['id'] for recipe in recipes}
+    )
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in state['favorite']
+        recipe['is_in_shopping_cart'] = recipe['id'] in state['cart']
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in state['follow']
+        )
+
+
+class CatalogCacheMixin:
+    """Отдаёт список и объекты справочника из кэша."""
+
+    def list(self, request, *args, **kwargs):
+        model = self.queryset.model
+        params = sorted(request.query_params.lists())
+        version = catalog.get_version(model)
+        return conditional_response(
+            request,
+            make_etag(model._meta.label_lower, version, 'list', params),
+            version,
+            partial(self.cached_list, request, *args, **kwargs)
+        )
+
+    def cached_list(self, request, *args, **kwargs):
+        key = catalog.make_key(
+            self.queryset.model, 'list',
+            sorted(request.query_params.lists())
+        )
+        data = catalog.cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            catalog.cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        model = self.queryset.model
+        pk = self.kwargs[self.lookup_field]
+        version = catalog.get_version(model)
+        return conditional_response(
+            request,
+            make_etag(model._meta.label_lower, version, pk),
+            version,
+            partial(self.cached_retrieve, pk)
+        )
+
+    def cached_retrieve(self, pk):
+        instance = None
+        if pk.isdigit():
+            instance = catalog.get_objects(
+                self.queryset.model, [int(pk)]
+            ).get(int(pk))
+        if instance is None:
+            raise Http404
+        return Response(self.get_serializer(instance).data)
+
+
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     Принимает только GET запросы,
-    отдаёт список ингредиентов и ингредидиент по id.
+    отдаёт список ингредиентов и ингредидиент по id,
+    параметр limit ограничивает размер списка.
     """
 
     queryset = Ingredient.objects.all()
@@ -46,8 +196,15 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        limit = self.request.query_params.get('limit')
+        if self.action == 'list' and limit is not None and limit.isdigit():
+            queryset = queryset[:int(limit)]
+        return queryset
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """
     Принимает только GET запросы,
     отдаёт список тегов и тег по id.
@@ -58,6 +215,12 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
+RESPONSE_PARAMS = set(RecipeFilter.base_filters) | {
+    'page', 'limit', 'offset', 'cursor', 'pagination', 'format'
+}
+USER_PARAMS = {'is_favorited', 'is_in_shopping_cart'}
+
+
 class RecipeViewSet(viewsets.ModelViewSet):
     """
     Принимает все запросы,
@@ -72,17 +235,137 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    shared_payload = False
 
     def get_pagination_class(self):
-        is_in_shopping_cart = self.request.query_params.get(
-            'is_in_shopping_cart'
-        )
+        params = self.request.query_params
+        if 'cursor' in params or params.get('pagination') == 'cursor':
+            return RecipeCursorPagination
+        is_in_shopping_cart = params.get('is_in_shopping_cart')
         if is_in_shopping_cart is not None:
             return pagination.LimitOffsetPagination
         return pagination.PageNumberPagination
 
     pagination_class = property(fget=get_pagination_class)
 
+    def get_queryset(self):
+        if self.action == 'destroy':
+            return Recipe.objects.all()
+        if self.shared_payload:
+            return recipe_queryset(AnonymousUser())
+        return recipe_queryset(self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['shared'] = self.shared_payload
+        return context
+
+    def get_validators(self, request, last_modified, *parts):
+        """
+        Ключ общих для всех пользователей данных, ETag и Last-Modified
+        рецептов. Ключ и ETag учитывают версии справочников,
+        пользователей и рецептов, а ETag авторизованного
+        пользователя - ещё и версию его избранного, покупок и подписок.
+        """
+        keys = [
+            catalog.version_parts(Tag),
+            catalog.version_parts(Ingredient),
+            ('users',),
+            ('recipes',),
+        ]
+        if request.user.is_authenticated:
+            keys.append(('user-state', request.user.id))
+        found = versions.get_versions(*keys)
+        timestamps = [
+            last_modified.timestamp() if last_modified else 0.0,
+            *found[:4]
+        ]
+        shared_key = make_etag(*parts, *timestamps)
+        if not request.user.is_authenticated:
+            return shared_key, shared_key, max(timestamps)
+        user_version = found[4]
+        return (
+            shared_key,
+            make_etag(shared_key, request.user.id, user_version),
+            max(*timestamps, user_version)
+        )
+
+    def get_response_params(self, request):
+        """
+        Параметры запроса, от которых зависит ответ, в каноническом
+        порядке: лишние параметры не порождают отдельных записей кэша.
+        """
+        return sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name in RESPONSE_PARAMS
+        )
+
+    def cached_response(self, request, shared_key, get_response):
+        """
+        Общая для всех пользователей часть ответа берётся из кэша,
+        а флаги избранного, покупок и подписки авторизованного
+        пользователя накладываются поверх неё одним запросом.
+        Ключ включает версии рецептов, пользователей и справочников,
+        поэтому запись устаревает при любом их изменении.
+        Фильтры по избранному и покупкам зависят от пользователя
+        и в кэш не попадают.
+        """
+        user = request.user
+        if user.is_authenticated and USER_PARAMS & set(request.query_params):
+            return get_response()
+        key = f'recipes:response:{request.get_host()}:{shared_key}'
+        data = cache.get(key)
+        registry.observe_cache('recipes', data is not None)
+        if data is None:
+            self.shared_payload = True
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+            hit = 'MISS'
+        else:
+            hit = 'HIT'
+        if user.is_authenticated:
+            recipes = data['results'] if 'results' in data else [data]
+            apply_user_state(user, recipes)
+        response = Response(data)
+        response['X-Cache'] = hit
+        return response
+
+    def list(self, request, *args, **kwargs):
+        shared_key, etag, last_modified = self.get_validators(
+            request, None, self.get_response_params(request)
+        )
+        return conditional_response(
+            request, etag, last_modified,
+            partial(
+                self.cached_response, request, shared_key,
+                partial(super().list, request, *args, **kwargs)
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not str(kwargs['pk']).isdigit():
+            raise Http404
+        updated_at = Recipe.objects.filter(
+            pk=kwargs['pk']
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        shared_key, etag, last_modified = self.get_validators(
+            request, updated_at, kwargs['pk'],
+            self.get_response_params(request)
+        )
+        return conditional_response(
+            request, etag, last_modified,
+            partial(
+                self.cached_response, request, shared_key,
+                partial(super().retrieve, request, *args, **kwargs)
+            )
+        )
+
     def get_permissions(self):
         if self.request.method in ('PATCH', 'DELETE'):
             return (IsAuthorPermission(),)
@@ -106,34 +389,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
 
-        result = {}
-        recipes = Recipe.objects.filter(
-            shopper__user=request.user
-        ).values_list('recipe_ingredients', flat=True)
-
-        for id in list(recipes):
-            ingredient = IngredientRecipe.objects.filter(id=id)
-            name = list(ingredient.values_list(
-                'ingredients__name',
-                flat=True
-            ))[0]
-            amount = list(ingredient.values_list('amount', flat=True))[0]
-            measurement_unit = list(ingredient.values_list(
-                'ingredients__measurement_unit', flat=True
-            ))[0]
-            if name in result:
-                result[name][1] += amount
-            else:
-                result[name] = [measurement_unit, amount]
-
-        my_file = open("shopping_list.txt", "w+")
-        my_file.write("Список покупок \n")
-
-        for name, count in result.items():
-            my_file.write(f"{name} - {count[1]} {count[0]}\n")
-        my_file.close()
-
-        return FileResponse(open("shopping_list.txt", "rb"))
+        ingredients = CartTotal.objects.shopping_list(request.user)
+
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'file_format': f'Доступные форматы: '
+                                f'{", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type, export = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            export(ingredients.iterator()),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{file_format}"'
+        )
+        return response
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_summary(self, request):
+        """Суммы ингредиентов списка покупок пользователя."""
+        serializer = CartTotalSerializer(
+            CartTotal.objects.shopping_list(request.user), many=True
+        )
+        return Response(serializer.data)
+
+    @action(methods=['get'], detail=False)
+    def what_to_cook(self, request):
+        """
+        Рецепты по имеющимся ингредиентам ?ingredients=1,2,3
+        в порядке убывания доли имеющихся ингредиентов.
+        """
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value.strip()
+            }
+        except ValueError:
+            ingredient_ids = None
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': 'Передайте id ингредиентов через запятую.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        paginator = pagination.PageNumberPagination()
+        page = paginator.paginate_queryset(
+            ingredient_index.rank(ingredient_ids), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, matched, total in page]
+        )
+        results = []
+        for recipe_id, matched, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.matched_count = matched
+                recipe.coverage = round(matched / total, 4)
+                results.append(recipe)
+        serializer = CookableRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
 
     @action(
         methods=['post', 'delete'],
@@ -195,6 +518,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         shopper.delete()
         return Response(serializer.data, status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return batch_response(request, Favorite)
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return batch_response(request, ShoppingList)
+
 
 class APIFollow(APIView):
     """
@@ -241,6 +580,21 @@ class APIFollow(APIView):
         return Response(serializer.data, status=status.HTTP_204_NO_CONTENT)
 
 
+class APIFollowBatch(APIView):
+    """
+    Принимает только POST и DELETE запросы,
+    подписывает на список авторов или отписывает от них.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        return batch_response(request, Follow)
+
+    def delete(self, request):
+        return batch_response(request, Follow)
+
+
 class APIMyUser(generics.ListCreateAPIView):
     """
     Принимает только GET запрос,
@@ -253,5 +607,61 @@ class APIMyUser(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        queryset = User.objects.filter(following__user=user)
+        recipes_limit = get_recipes_limit(self.request)
+        limited_recipes = Recipe.objects.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            )
+        )
+        queryset = User.objects.filter(
+            following__user=user
+        ).annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('pk')
+            ))
+        ).prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=limited_recipes,
+                to_attr='limited_recipes'
+            )
+        )
         return queryset
+
+
+class APIFeed(generics.ListAPIView):
+    """
+    Принимает только GET запрос,
+    отдаёт новые рецепты авторов, на которых подписан пользователь.
+    Первая страница ленты кэшируется для каждого пользователя.
+    """
+
+    serializer_class = GetRecipeSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return recipe_queryset(user).filter(
+            Exists(Follow.objects.filter(user=user, author=OuterRef('author')))
+        )
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        key = feed.head_key(request.get_host(), request.user.id)
+        state = tuple(versions.get_versions(
+            ('recipes',),
+            catalog.version_parts(Tag),
+            catalog.version_parts(Ingredient),
+            ('users',),
+            ('user-state', request.user.id),
+        ))
+        cached = cache.get(key)
+        if cached is not None and cached[0] == state:
+            return Response(cached[1])
+        data = super().list(request, *args, **kwargs).data
+        cache.set(key, (state, data), settings.FEED_CACHE_TIMEOUT)
+        return Response(data)
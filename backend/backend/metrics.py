@@ -0,0 +1,277 @@
+"""
+Метрики запросов к приложению.
+
+MetricsMiddleware считает для каждого представления число SQL-запросов,
+время в БД, время сериализации объектов (to_representation
+сериализаторов с TimedSerializerMixin, без SQL-запросов внутри неё),
+время отрисовки ответа (кодирование данных в JSON) и общее время
+обработки. Значения текущего запроса отдаются
+в заголовке Server-Timing, накопленные по процессу - в текстовом
+формате Prometheus по адресу /metrics вместе с числом попаданий
+и промахов кэшей ответов.
+
+Если для метода и представления задан бюджет в QUERY_BUDGETS
+(ключ вида 'GET api:recipe-list') и запрос его превысил, в журнал
+пишется предупреждение, а при QUERY_BUDGET_STRICT выбрасывается
+QueryBudgetExceeded - так бюджет проверяется в тестах.
+Запросы, выполненные при отдаче StreamingHttpResponse, не учитываются:
+они происходят уже после выхода из middleware.
+"""
+import logging
+import threading
+from collections import defaultdict
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше SQL-запросов, чем разрешено."""
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы и время в БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+
+
+class ViewMetrics:
+    """Накопленные значения одного представления и метода."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class Registry:
+    """Метрики процесса, сгруппированные по представлению и методу."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+        self.caches = defaultdict(lambda: {'hit': 0, 'miss': 0})
+
+    def observe(self, view, method, status, seconds,
+                queries, db_seconds, serialize_seconds, render_seconds):
+        with self.lock:
+            metrics = self.views[view, method]
+            metrics.requests += 1
+            metrics.errors += status >= 500
+            metrics.queries += queries
+            metrics.db_seconds += db_seconds
+            metrics.serialize_seconds += serialize_seconds
+            metrics.render_seconds += render_seconds
+            metrics.seconds += seconds
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    metrics.buckets[index] += 1
+
+    def observe_cache(self, name, hit):
+        with self.lock:
+            self.caches[name]['hit' if hit else 'miss'] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.caches.clear()
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        with self.lock:
+            items = sorted(self.views.items())
+            labels = {
+                key: f'view="{key[0]}",method="{key[1]}"' for key, _ in items
+            }
+            counters = (
+                ('requests', 'http_requests_total', 'Processed requests.'),
+                ('errors', 'http_request_errors_total',
+                 'Requests that ended with a 5xx response.'),
+                ('queries', 'http_request_db_queries_total',
+                 'SQL queries executed while handling requests.'),
+                ('db_seconds', 'http_request_db_seconds_total',
+                 'Time spent in SQL queries.'),
+                ('serialize_seconds', 'http_request_serialize_seconds_total',
+                 'Time spent converting objects to response data.'),
+                ('render_seconds', 'http_request_render_seconds_total',
+                 'Time spent rendering responses.'),
+            )
+            for attr, name, help_text in counters:
+                family(name, 'counter', help_text, [
+                    f'{name}{{{labels[key]}}} {getattr(metrics, attr)}'
+                    for key, metrics in items
+                ])
+            samples = []
+            name = 'http_request_duration_seconds'
+            for key, metrics in items:
+                for bound, count in zip(BUCKETS, metrics.buckets):
+                    samples.append(
+                        f'{name}_bucket{{{labels[key]},le="{bound}"}} {count}'
+                    )
+                samples.append(
+                    f'{name}_bucket{{{labels[key]},le="+Inf"}} '
+                    f'{metrics.requests}'
+                )
+                samples.append(
+                    f'{name}_sum{{{labels[key]}}} {metrics.seconds}'
+                )
+                samples.append(
+                    f'{name}_count{{{labels[key]}}} {metrics.requests}'
+                )
+            family(name, 'histogram', 'Request latency.', samples)
+
+            caches = sorted(self.caches.items())
+            family('response_cache_requests_total', 'counter',
+                   'Response cache lookups by result.', [
+                       f'response_cache_requests_total'
+                       f'{{cache="{cache}",result="{result}"}} {count}'
+                       for cache, results in caches
+                       for result, count in sorted(results.items())
+                   ])
+            family('response_cache_hit_ratio', 'gauge',
+                   'Share of response cache lookups that were hits.', [
+                       f'response_cache_hit_ratio{{cache="{cache}"}} '
+                       f'{results["hit"] / sum(results.values()):.4f}'
+                       for cache, results in caches
+                   ])
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и добавляет заголовок Server-Timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request.query_counter = counter
+        request.serializing = False
+        request.serialize_seconds = 0.0
+        request.render_seconds = 0.0
+        start = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        seconds = perf_counter() - start
+
+        view = get_view_name(request)
+        if view == 'metrics':
+            return response
+        app_seconds = (
+            seconds - counter.duration
+            - request.serialize_seconds - request.render_seconds
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={counter.duration * 1000:.1f};'
+            f'desc="{counter.count} queries"',
+            f'app;dur={app_seconds * 1000:.1f}',
+            f'serialize;dur={request.serialize_seconds * 1000:.1f}',
+            f'render;dur={request.render_seconds * 1000:.1f}',
+            f'total;dur={seconds * 1000:.1f}',
+        ))
+        registry.observe(
+            view, request.method, response.status_code, seconds,
+            counter.count, counter.duration,
+            request.serialize_seconds, request.render_seconds
+        )
+        self.check_budget(f'{request.method} {view}', counter.count)
+        return response
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def timed_render():
+            start = perf_counter()
+            try:
+                return render()
+            finally:
+                request.render_seconds += perf_counter() - start
+
+        response.render = timed_render
+        return response
+
+    def check_budget(self, key, queries):
+        budget = settings.QUERY_BUDGETS.get(key)
+        if budget is None or queries <= budget:
+            return
+        message = f'{key}: {queries} SQL-запросов при бюджете {budget}'
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class TimedSerializerMixin:
+    """
+    Учитывает время to_representation в метриках запроса.
+    Вложенные сериализаторы вызываются внутри внешнего, поэтому
+    замеряется только самый внешний вызов; время SQL-запросов,
+    выполненных при сериализации, уже учтено в db и вычитается.
+    """
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        if isinstance(request, Request):
+            request = request._request
+        if getattr(request, 'serializing', True):
+            return super().to_representation(instance)
+        request.serializing = True
+        db_seconds = request.query_counter.duration
+        start = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request.serializing = False
+            request.serialize_seconds += (
+                perf_counter() - start
+                - (request.query_counter.duration - db_seconds)
+            )
+
+
+def metrics_view(request):
+    """Метрики процесса для Prometheus."""
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
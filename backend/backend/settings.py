@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,6 +102,44 @@ DATABASES = {
     }
 }
 
+# Кэш: по умолчанию локальная память процесса (LRU + TTL),
+# для общего кэша между воркерами можно указать файловый бэкенд.
+# В default лежат версии данных, ответы с рецептами и ленты подписок,
+# в catalog - справочники тегов и ингредиентов с записью на каждый
+# объект, чтобы они не вытесняли версии и ответы.
+
+CACHES = {
+    'default': {
+        'BACKEND': env(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': env('CACHE_LOCATION', default='foodgram'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', default=20000),
+        },
+    },
+    'catalog': {
+        'BACKEND': env(
+            'CATALOG_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': env('CATALOG_CACHE_LOCATION', default='foodgram-catalog'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CATALOG_CACHE_MAX_ENTRIES', default=10000),
+        },
+    },
+}
+
+# Версии данных хранятся в БД и читаются через кэш не реже, чем раз
+# в VERSION_CACHE_TIMEOUT секунд (см. recipes.versions).
+VERSION_CACHE_TIMEOUT = 2
+CATALOG_CACHE_TIMEOUT = 60 * 15
+FEED_CACHE_TIMEOUT = 60 * 5
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -146,6 +185,52 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Фоновая обработка изображений рецептов.
+
+IMAGE_WORKERS = 2
+IMAGE_THUMBNAIL_SIZE = (480, 480)
+IMAGE_MAX_SIZE = (1600, 1600)
+IMAGE_WEBP_QUALITY = 80
+# Файлы изображений, сохранённые или повторно использованные недавно,
+# не удаляются: ссылающийся на них рецепт может быть ещё
+# не зафиксирован.
+IMAGE_RELEASE_MIN_AGE = 60 * 60
+
+# Окно для сортировки рецептов ordering=trending.
+
+TRENDING_DAYS = 7
+
+# Метрики запросов (backend/metrics.py): бюджет SQL-запросов
+# на один запрос по ключу 'МЕТОД имя_представления'. При
+# QUERY_BUDGET_STRICT превышение бюджета вызывает исключение,
+# иначе пишется в журнал.
+
+QUERY_BUDGETS = {
+    'GET api:recipe-list': 9,
+    'GET api:recipe-detail': 8,
+    'GET api:recipe-what-to-cook': 8,
+    'GET api:recipe-shopping-cart-summary': 2,
+    'GET api:ingredient-list': 3,
+    'GET api:ingredient-detail': 2,
+    'GET api:tag-list': 3,
+    'GET api:tag-detail': 2,
+    'GET api:myuser-list': 4,
+    'GET api:myuser-detail': 3,
+    'GET api:myuser-me': 2,
+    'GET api:subscriptions': 4,
+    'GET api:feed': 7,
+    'POST api:recipe-list': 21,
+    'PATCH api:recipe-detail': 25,
+    'DELETE api:recipe-detail': 23,
+    'POST api:recipe-favorite-batch': 6,
+    'DELETE api:recipe-favorite-batch': 5,
+    'POST api:recipe-shopping-cart-batch': 8,
+    'DELETE api:recipe-shopping-cart-batch': 8,
+    'POST api:subscribe-batch': 6,
+    'DELETE api:subscribe-batch': 5,
+}
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=False)
+
 
 AUTH_USER_MODEL = 'users.MyUser'
 
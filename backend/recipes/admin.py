@@ -30,8 +30,7 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientRecipeAdminInline, TagRecipeAdminInline)
 
     def followers(self, obj):
-        result = Favorite.objects.filter(recipe=obj)
-        return len(list(result))
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
@@ -0,0 +1,86 @@
+"""
+Пакетное добавление и удаление избранного, рецептов в списке покупок
+и подписок.
+
+Существование объектов проверяется одним запросом, связи создаются
+одним INSERT ... ON CONFLICT DO NOTHING и удаляются одним DELETE
+(см. recipes.bulk). Оба запроса возвращают строки, которые они
+действительно изменили, поэтому связь, созданная или удалённая
+параллельным запросом, не учитывается дважды. Сигналы при этом
+не отправляются: счётчики, суммы списка покупок и версия состояния
+пользователя обновляются здесь же, одним запросом на каждое.
+Результат - словарь {id: статус} в порядке переданных id.
+"""
+from django.db import transaction
+
+from . import bulk, cart, counters, versions
+from .models import User, Recipe, Favorite, ShoppingList, Follow
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+# Связь пользователя -> (поле связи, модель связываемого объекта).
+RELATIONS = {
+    Favorite: ('recipe', Recipe),
+    ShoppingList: ('recipe', Recipe),
+    Follow: ('author', User),
+}
+
+
+def update_derived(model, user, ids, sign):
+    """Обновляет данные, которые для одиночных связей меняют сигналы."""
+    counter_model, field, _ = counters.RELATIONS[model]
+    counters.change(counter_model, field, ids, sign)
+    if model is ShoppingList:
+        cart.add_recipes(user.id, ids, sign)
+    versions.bump_on_commit('user-state', user.id)
+
+
+@transaction.atomic
+def add(model, user, ids):
+    """Создаёт связи пользователя с объектами ids."""
+    field, target = RELATIONS[model]
+    found = set(
+        target.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    if model is Follow:
+        found.discard(user.id)
+    added = {
+        pk for pk, in bulk.insert_ignore(
+            model,
+            [model(user=user, **{f'{field}_id': pk}) for pk in ids
+             if pk in found],
+            (field,)
+        )
+    }
+    if added:
+        update_derived(model, user, [pk for pk in ids if pk in added], 1)
+    results = {}
+    for pk in ids:
+        if pk in added:
+            results[pk] = ADDED
+        elif pk in found:
+            results[pk] = EXISTS
+        elif model is Follow and pk == user.id:
+            results[pk] = SELF
+        else:
+            results[pk] = NOT_FOUND
+    return results
+
+
+@transaction.atomic
+def remove(model, user, ids):
+    """Удаляет связи пользователя с объектами ids."""
+    field, _ = RELATIONS[model]
+    removed = {
+        pk for pk, in bulk.delete(
+            model, (field,), user=user.id, **{field: ids}
+        )
+    }
+    if removed:
+        update_derived(model, user, [pk for pk in ids if pk in removed], -1)
+    return {pk: REMOVED if pk in removed else MISSING for pk in ids}
@@ -0,0 +1,85 @@
+"""
+Пакетная запись без сигналов моделей.
+
+Вставка и удаление выполняются одним запросом с RETURNING и возвращают
+строки, которые действительно были вставлены или удалены. По ним
+вызывающий код сам обновляет производные данные (счётчики, индексы,
+суммы списков покупок), которые для одиночных объектов обновляют
+сигналы. Каскады не выполняются, поэтому на строки таких моделей
+не должны ссылаться другие таблицы.
+"""
+from django.db import connection
+
+
+def column_list(model, fields):
+    quote = connection.ops.quote_name
+    return ', '.join(
+        quote(model._meta.get_field(name).column) for name in fields
+    )
+
+
+def insert_ignore(model, objects, returning):
+    """
+    Вставляет объекты, пропуская нарушающие ограничения уникальности,
+    и возвращает значения полей returning вставленных строк.
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+    opts = model._meta
+    fields = [
+        field for field in opts.concrete_fields
+        if field is not opts.auto_field
+    ]
+    rows = [
+        [
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in fields
+        ]
+        for obj in objects
+    ]
+    table = connection.ops.quote_name(opts.db_table)
+    columns = column_list(model, [field.name for field in fields])
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    batch_size = connection.ops.bulk_batch_size(fields, objects)
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'VALUES {", ".join([row_sql] * len(batch))} '
+                f'ON CONFLICT DO NOTHING '
+                f'RETURNING {column_list(model, returning)}',
+                [value for row in batch for value in row]
+            )
+            inserted.extend(cursor.fetchall())
+    return inserted
+
+
+def delete(model, returning, **conditions):
+    """
+    Удаляет строки, у которых поле равно значению или входит в список
+    значений conditions, и возвращает значения полей returning
+    удалённых строк.
+    """
+    where = []
+    params = []
+    for name, value in conditions.items():
+        column = column_list(model, [name])
+        if isinstance(value, (list, tuple, set, frozenset)):
+            if not value:
+                return []
+            where.append(f'{column} IN ({", ".join(["%s"] * len(value))})')
+            params.extend(value)
+        else:
+            where.append(f'{column} = %s')
+            params.append(value)
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {" AND ".join(where)} '
+            f'RETURNING {column_list(model, returning)}',
+            params
+        )
+        return cursor.fetchall()
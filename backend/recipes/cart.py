@@ -0,0 +1,111 @@
+"""
+Предрассчитанные суммы списков покупок.
+
+В CartTotal для каждого пользователя хранится сумма каждого ингредиента
+по всем рецептам из его списка покупок. Суммы меняются на разницу
+в той же транзакции, что и данные: при добавлении и удалении рецепта
+из списка покупок и при изменении ингредиентов рецепта, который лежит
+в чьих-то списках. Поэтому скачивание списка и сводка читают готовые
+строки одного пользователя по индексу, без группировки по рецептам.
+Если суммы разошлись с данными, их пересчитывает команда
+rebuild_cart_totals.
+"""
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import IngredientRecipe, ShoppingList, CartTotal
+
+
+def apply(deltas):
+    """
+    Прибавляет изменения {(user_id, ingredient_id): delta} к суммам
+    одним многострочным INSERT ... ON CONFLICT DO UPDATE на пачку
+    и удаляет обнулившиеся строки.
+    """
+    rows = [
+        (user_id, ingredient_id, delta)
+        for (user_id, ingredient_id), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(CartTotal._meta.db_table)
+    fields = [
+        CartTotal._meta.get_field(name)
+        for name in ('user', 'ingredient', 'amount')
+    ]
+    user, ingredient, amount = (quote(field.column) for field in fields)
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                f'VALUES {values} '
+                f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                f'SET {amount} = {table}.{amount} + excluded.{amount}',
+                [value for row in batch for value in row]
+            )
+    if any(row[2] < 0 for row in rows):
+        CartTotal.objects.filter(
+            user_id__in={row[0] for row in rows}, amount__lte=0
+        ).delete()
+
+
+def add_recipes(user_id, recipe_ids, sign=1):
+    """
+    Учитывает рецепты, добавленные в список покупок
+    (sign=-1 - убранные из него).
+    """
+    apply({
+        (user_id, row['ingredients_id']): sign * row['total_amount']
+        for row in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredients_id').annotate(
+            total_amount=Sum('amount')
+        ).order_by()
+    })
+
+
+def add_recipe(user_id, recipe_id):
+    add_recipes(user_id, [recipe_id])
+
+
+def remove_recipe(user_id, recipe_id):
+    add_recipes(user_id, [recipe_id], -1)
+
+
+def change_recipe(recipe_id, changes):
+    """
+    Учитывает изменение состава рецепта {ingredient_id: delta}
+    у всех пользователей, в чьих списках покупок он лежит.
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = ShoppingList.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True)
+    apply({
+        (user_id, ingredient_id): delta
+        for user_id in user_ids
+        for ingredient_id, delta in changes.items()
+    })
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает все суммы по спискам покупок."""
+    CartTotal.objects.all().delete()
+    CartTotal.objects.bulk_create(
+        (
+            CartTotal(
+                user_id=row['recipe__shopper__user_id'],
+                ingredient_id=row['ingredients_id'],
+                amount=row['total_amount']
+            )
+            for row in IngredientRecipe.objects.cart_totals().iterator()
+        ),
+        batch_size=1000
+    )
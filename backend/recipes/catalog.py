@@ -0,0 +1,86 @@
+"""
+Кэш справочников (теги и ингредиенты).
+
+Справочник хранится в отдельном кэше Django catalog под ключами
+с версией: целиком для списков и индексов и отдельной записью на каждый
+объект для проверки и выдачи объектов по id. Записей на объекты много,
+поэтому они не делят кэш с версиями данных и ответами. При изменении
+модели версия заменяется новой меткой времени, и старые записи
+перестают читаться, а затем вытесняются по TTL.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from . import versions
+
+cache = ConnectionProxy(caches, 'catalog')
+
+
+def version_parts(model):
+    """Части ключа версии справочника для versions.get_versions."""
+    return 'catalog', model._meta.label_lower
+
+
+def get_version(model):
+    """Текущая версия справочника - время последнего изменения."""
+    return versions.get_version(*version_parts(model))
+
+
+def invalidate(model):
+    """Сбрасывает кэш справочника, выставляя новую версию."""
+    versions.bump(*version_parts(model))
+
+
+def make_key(model, *parts):
+    """Ключ кэша для данных справочника текущей версии."""
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'catalog:{model._meta.label_lower}:{get_version(model)}:{digest}'
+
+
+def get_catalog(model):
+    """Словарь {pk: объект} со всеми записями справочника."""
+    key = make_key(model, 'objects')
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = {obj.pk: obj for obj in model.objects.all()}
+        cache.set(key, catalog, settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
+
+
+def get_objects(model, pks):
+    """
+    Словарь {pk: объект} для переданных pk. Записи читаются из кэша
+    одним get_many, недостающие загружаются одним запросом к БД.
+    """
+    prefix = make_key(model, 'object')
+    keys = {f'{prefix}:{pk}': pk for pk in pks}
+    objects = {
+        keys[key]: obj for key, obj in cache.get_many(list(keys)).items()
+    }
+    missing = [pk for pk in keys.values() if pk not in objects]
+    if missing:
+        found = model.objects.in_bulk(missing)
+        cache.set_many(
+            {f'{prefix}:{pk}': obj for pk, obj in found.items()},
+            settings.CATALOG_CACHE_TIMEOUT
+        )
+        objects.update(found)
+    return objects
+
+
+def get_index(model, field):
+    """Словарь {значение поля: pk} для поиска записей без запроса к БД."""
+    key = make_key(model, 'index', field)
+    index = cache.get(key)
+    if index is None:
+        index = {
+            getattr(obj, field): pk
+            for pk, obj in get_catalog(model).items()
+        }
+        cache.set(key, index, settings.CATALOG_CACHE_TIMEOUT)
+    return index
@@ -0,0 +1,66 @@
+"""
+Счётчики, хранящиеся в столбцах моделей.
+
+Recipe.favorites_count, Recipe.shopping_count, Recipe.ingredients_count,
+User.recipes_count и User.followers_count обновляются атомарно выражениями F()
+при записи связанных объектов. Если счётчики разошлись с данными,
+их пересчитывает команда recount.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import (
+    User, Recipe, IngredientRecipe,
+    Favorite, ShoppingList, Follow
+)
+
+# Связь пользователя -> (модель со счётчиком, поле счётчика,
+# атрибут связи с id объекта этой модели).
+RELATIONS = {
+    Favorite: (Recipe, 'favorites_count', 'recipe_id'),
+    ShoppingList: (Recipe, 'shopping_count', 'recipe_id'),
+    Follow: (User, 'followers_count', 'author_id'),
+}
+
+
+def change(model, field, ids, delta=1):
+    """
+    Изменяет счётчик field на delta для каждого вхождения id в ids.
+    Объекты с одинаковым итоговым изменением обновляются одним запросом.
+    """
+    groups = defaultdict(list)
+    for pk, count in Counter(ids).items():
+        groups[count * delta].append(pk)
+    for total, pks in groups.items():
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + total, Value(0))}
+        )
+
+
+def count_of(model, field):
+    """Подзапрос с количеством объектов model, ссылающихся на строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount():
+    """Пересчитывает все счётчики по фактическим данным."""
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite, 'recipe'),
+        shopping_count=count_of(ShoppingList, 'recipe'),
+        ingredients_count=count_of(IngredientRecipe, 'recipe')
+    )
+    User.objects.update(
+        recipes_count=count_of(Recipe, 'author'),
+        followers_count=count_of(Follow, 'author')
+    )
@@ -0,0 +1,16 @@
+"""
+Кэш первой страницы ленты подписок.
+
+Лента собирается при чтении одним запросом по подпискам пользователя,
+а её первая страница кэшируется отдельно для каждого пользователя
+и хоста: ссылки на изображения в ответе абсолютные. Запись хранится
+вместе с версиями рецептов, пользователей, справочников и подписок
+пользователя и не отдаётся, если хотя бы одна из них сменилась.
+Версии общие для всех процессов (см. versions), поэтому публикация
+или изменение рецепта автором сбрасывает ленту его подписчиков
+в каждом воркере.
+"""
+
+
+def head_key(host, user_id):
+    return f'feed:{host}:{user_id}:head'
@@ -0,0 +1,134 @@
+"""
+Обработка изображений рецептов вне запроса.
+
+После сохранения рецепта задача ставится в локальный пул потоков,
+который создаёт уменьшенную копию и WebP-вариант изображения.
+Рецепты с изображением без вариантов считаются очередью:
+их дообрабатывает команда process_recipe_images, например после
+перезапуска процесса, когда задачи из пула потеряны.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import versions
+from .models import Recipe
+from .storage import content_storage
+
+IMAGE_FIELDS = ('image', 'image_thumbnail', 'image_webp')
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def render_variant(image, size):
+    """Уменьшает изображение до size и кодирует его в WebP."""
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA')
+    buffer = BytesIO()
+    variant.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY)
+    return buffer.getvalue()
+
+
+def save_variant(content):
+    """Сохраняет вариант под именем из хэша содержимого."""
+    return content_storage.save(
+        'recipes/images/variants/variant.webp', ContentFile(content)
+    )
+
+
+def used_names(names):
+    """Имена из names, на которые ссылается хотя бы один рецепт."""
+    used = set()
+    for field in IMAGE_FIELDS:
+        used.update(Recipe.objects.filter(
+            **{f'{field}__in': names}
+        ).values_list(field, flat=True))
+    return used
+
+
+def delete_unused(names, min_age):
+    """
+    Удаляет файлы names, на которые не ссылается ни один рецепт
+    и которые не сохранялись последние min_age секунд.
+    Возвращает {имя: размер} удалённых файлов.
+    Возраст и ссылки проверяются под блокировкой хранилища прямо перед
+    удалением. Сохранение того же файла для ещё не зафиксированного
+    рецепта ждёт блокировку и обновляет время изменения файла,
+    поэтому такой файл не удаляется.
+    """
+    deleted = {}
+    with content_storage.lock():
+        candidates = {
+            name for name in names
+            if content_storage.exists(name)
+            and content_storage.age(name) >= min_age
+        }
+        for name in candidates - used_names(candidates):
+            deleted[name] = content_storage.size(name)
+            content_storage.delete(name)
+    return deleted
+
+
+def release(names):
+    """
+    Удаляет файлы, на которые больше не ссылается ни один рецепт.
+    Одинаковые изображения хранятся в одном файле, поэтому файл
+    удаляется, только когда число ссылок на него стало нулевым.
+    """
+    names = {name for name in names if name}
+    if names:
+        delete_unused(names, settings.IMAGE_RELEASE_MIN_AGE)
+
+
+def release_on_commit(names):
+    names = list(names)
+    transaction.on_commit(lambda: release(names))
+
+
+def process_recipe_image(recipe_id):
+    """Создаёт варианты изображения рецепта и сохраняет их имена."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    with content_storage.open(source) as file:
+        image = Image.open(file)
+        image.load()
+    thumbnail = save_variant(
+        render_variant(image, settings.IMAGE_THUMBNAIL_SIZE)
+    )
+    webp = save_variant(render_variant(image, settings.IMAGE_MAX_SIZE))
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_thumbnail=thumbnail,
+        image_webp=webp,
+        updated_at=timezone.now()
+    )
+    if updated:
+        versions.bump('recipes')
+
+
+def run(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Recipe %s image processing failed', recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule(recipe_id):
+    """Ставит обработку изображения в очередь после фиксации транзакции."""
+    transaction.on_commit(lambda: executor.submit(run, recipe_id))
@@ -0,0 +1,159 @@
+"""
+Обратный индекс «ингредиент -> рецепты» для поиска рецептов
+по имеющимся продуктам.
+
+Для каждого ингредиента в IngredientIndex хранится отсортированный
+массив id рецептов с этим ингредиентом. Запрос читает строки индекса
+переданных ингредиентов и считает совпадения в памяти, а число
+ингредиентов рецептов для доли совпадений берёт из
+Recipe.ingredients_count.
+После фиксации транзакции, изменившей состав рецепта, в строки его
+добавленных и убранных ингредиентов вносится разница. Строки
+блокируются на время изменения, поэтому параллельные изменения
+рецептов с общим ингредиентом не затирают друг друга. Команда
+rebuild_ingredient_index строит индекс заново целиком.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import partial
+from itertools import groupby
+
+from django.db import connection, transaction
+
+from . import bulk, counters
+from .models import Recipe, IngredientRecipe, IngredientIndex
+
+TYPECODE = 'I'
+
+
+def encode(recipe_ids):
+    return array(TYPECODE, recipe_ids).tobytes()
+
+
+def decode(data):
+    """Id рецептов из строки индекса."""
+    values = array(TYPECODE)
+    values.frombytes(data)
+    return values
+
+
+def index_rows(rows):
+    """Группирует строки (ingredient_id, recipe_id) по ингредиенту."""
+    for ingredient_id, group in groupby(rows, key=lambda row: row[0]):
+        yield IngredientIndex(
+            ingredient_id=ingredient_id,
+            postings=encode(row[1] for row in group)
+        )
+
+
+@transaction.atomic
+def update(recipe_id, added=(), removed=()):
+    """
+    Добавляет рецепт в строки ингредиентов added и убирает его
+    из строк ингредиентов removed. Строки блокируются в порядке id
+    ингредиентов.
+    """
+    added = set(added)
+    removed = set(removed) - added
+    removed.discard(None)
+    if not added and not removed:
+        return
+    bulk.insert_ignore(
+        IngredientIndex,
+        [IngredientIndex(ingredient_id=pk) for pk in sorted(added)],
+        ('ingredient',)
+    )
+    rows = IngredientIndex.objects.select_for_update().filter(
+        ingredient_id__in=added | removed
+    ).order_by('ingredient_id')
+    changed, empty = [], []
+    for row in rows:
+        recipe_ids = decode(row.postings)
+        position = bisect_left(recipe_ids, recipe_id)
+        present = (
+            position < len(recipe_ids) and recipe_ids[position] == recipe_id
+        )
+        if row.ingredient_id in added and not present:
+            recipe_ids.insert(position, recipe_id)
+        elif row.ingredient_id in removed and present:
+            del recipe_ids[position]
+        else:
+            continue
+        if recipe_ids:
+            row.postings = recipe_ids.tobytes()
+            changed.append(row)
+        else:
+            empty.append(row.ingredient_id)
+    IngredientIndex.objects.bulk_update(changed, ('postings',))
+    if empty:
+        IngredientIndex.objects.filter(ingredient_id__in=empty).delete()
+
+
+def update_on_commit(recipe_id, added=(), removed=()):
+    transaction.on_commit(
+        partial(update, recipe_id, list(added), list(removed))
+    )
+
+
+def change(recipe_id, added=(), removed=()):
+    """
+    Учитывает добавленные и удалённые ингредиенты рецепта:
+    меняет счётчик ингредиентов и строки индекса.
+    """
+    added, removed = list(added), list(removed)
+    if not added and not removed:
+        return
+    delta = len(added) - len(removed)
+    if delta:
+        counters.change(Recipe, 'ingredients_count', [recipe_id], delta)
+    update_on_commit(recipe_id, added, removed)
+
+
+@transaction.atomic
+def rebuild():
+    """Строит индекс заново по всем ингредиентам рецептов."""
+    IngredientIndex.objects.all().delete()
+    IngredientIndex.objects.bulk_create(
+        index_rows(
+            IngredientRecipe.objects.order_by(
+                'ingredients_id', 'recipe_id'
+            ).values_list('ingredients_id', 'recipe_id').iterator()
+        ),
+        batch_size=500
+    )
+
+
+def ingredient_counts(recipe_ids):
+    """Число ингредиентов рецептов {recipe_id: count}."""
+    recipe_ids = list(recipe_ids)
+    size = connection.ops.bulk_batch_size(['pk'], recipe_ids) or 1
+    counts = {}
+    for start in range(0, len(recipe_ids), size):
+        counts.update(Recipe.objects.filter(
+            pk__in=recipe_ids[start:start + size]
+        ).values_list('pk', 'ingredients_count'))
+    return counts
+
+
+def rank(ingredient_ids):
+    """
+    Рецепты, в которых есть хотя бы один из ингредиентов,
+    по убыванию доли имеющихся ингредиентов, затем по числу совпадений.
+    Возвращает список (recipe_id, matched, total).
+    """
+    matched = Counter()
+    for data in IngredientIndex.objects.filter(
+        ingredient_id__in=set(ingredient_ids)
+    ).values_list('postings', flat=True):
+        matched.update(decode(data))
+    totals = ingredient_counts(matched)
+    ranked = [
+        (recipe_id, count, max(totals[recipe_id], count))
+        for recipe_id, count in matched.items() if recipe_id in totals
+    ]
+    ranked.sort(
+        key=lambda item: (item[1] / item[2], item[1], item[0]),
+        reverse=True
+    )
+    return ranked
@@ -0,0 +1,260 @@
+import json
+import math
+import random
+import re
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from recipes.models import User, Recipe, Ingredient, Tag, ShoppingList
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# Имя, вес в смеси, нужен ли токен, шаблон адреса.
+MIX = (
+    ('recipes', 25, False, '/api/recipes/?page={page}'),
+    ('recipes-auth', 15, True, '/api/recipes/?page={page}'),
+    ('recipes-tags', 8, False, '/api/recipes/?tags={tag}'),
+    ('recipes-search', 5, False, '/api/recipes/?search={word}'),
+    ('recipe', 15, False, '/api/recipes/{recipe}/'),
+    ('ingredients', 10, False, '/api/ingredients/?name={prefix}'),
+    ('subscriptions', 8, True, '/api/users/subscriptions/'),
+    ('feed', 8, True, '/api/users/feed/'),
+    ('shopping-cart', 6, True, '/api/recipes/download_shopping_cart/'),
+    ('cart-summary', 4, True, '/api/recipes/shopping_cart_summary/'),
+)
+
+
+def percentile(values, share):
+    """Перцентиль по методу ближайшего ранга."""
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a mix of API requests through the test client "
+        "or against --base-url and reports latency, queries and RPS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--base-url')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default='benchmarks/results.jsonl'
+        )
+        parser.add_argument('--label', default='')
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help='Allowed p95 latency growth in percent.'
+        )
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        plan = self.make_plan(options['requests'], options['users'])
+        if options['base_url']:
+            mode = 'http'
+            send = self.http_sender(options['base_url'])
+            start = perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                samples = list(executor.map(lambda item: send(*item), plan))
+        else:
+            mode = 'client'
+            send = self.client_sender()
+            start = perf_counter()
+            samples = [send(*item) for item in plan]
+        elapsed = perf_counter() - start
+
+        result = self.summarize(samples, elapsed)
+        result.update(
+            label=options['label'] or self.git_revision(),
+            created=datetime.now(timezone.utc).isoformat(),
+            mode=mode
+        )
+        previous = self.load_previous(options['output'], mode)
+        regressions = self.report(result, previous, options['threshold'])
+        self.save(options['output'], result)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(
+                'p95 regression: ' + ', '.join(regressions)
+            )
+
+    def make_plan(self, count, users):
+        """Список запросов (имя, адрес, токен) в случайном порядке."""
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:1000]
+        )
+        if not recipe_ids:
+            raise CommandError('No recipes: run seed_data first.')
+        pages = max(1, min(len(recipe_ids) // 6, 20))
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        prefixes = list({
+            name[:2].lower() for name in
+            Ingredient.objects.values_list('name', flat=True)[:200]
+        })
+        words = list({
+            name.split()[0] for name in
+            Recipe.objects.values_list('name', flat=True)[:200]
+        })
+        user_ids = list(ShoppingList.objects.values_list(
+            'user_id', flat=True
+        ).distinct()[:users]) or list(
+            User.objects.values_list('id', flat=True)[:users]
+        )
+        tokens = [
+            Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in user_ids
+        ]
+
+        names, weights = zip(*((item[0], item[1]) for item in MIX))
+        templates = {item[0]: item for item in MIX}
+        plan = []
+        for name in self.random.choices(names, weights, k=count):
+            _, _, auth, template = templates[name]
+            path = template.format(
+                page=self.random.randint(1, pages),
+                tag=self.random.choice(tags) if tags else '',
+                word=self.random.choice(words),
+                recipe=self.random.choice(recipe_ids),
+                prefix=self.random.choice(prefixes) if prefixes else ''
+            )
+            token = self.random.choice(tokens) if auth else None
+            plan.append((name, path, token))
+        return plan
+
+    def client_sender(self):
+        client = Client(HTTP_HOST='localhost')
+
+        def send(name, path, token):
+            headers = {}
+            if token:
+                headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+            start = perf_counter()
+            response = client.get(path, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return self.sample(
+                name, response.status_code,
+                perf_counter() - start, response.get('Server-Timing', '')
+            )
+
+        return send
+
+    def http_sender(self, base_url):
+        base_url = base_url.rstrip('/')
+
+        def send(name, path, token):
+            headers = {}
+            if token:
+                headers['Authorization'] = f'Token {token}'
+            start = perf_counter()
+            response = requests.get(base_url + path, headers=headers)
+            return self.sample(
+                name, response.status_code, perf_counter() - start,
+                response.headers.get('Server-Timing', '')
+            )
+
+        return send
+
+    def sample(self, name, status, seconds, server_timing):
+        match = QUERIES.search(server_timing)
+        return name, status, seconds, int(match[1]) if match else None
+
+    def summarize(self, samples, elapsed):
+        groups = defaultdict(list)
+        for sample in samples:
+            groups[sample[0]].append(sample)
+            groups['total'].append(sample)
+        endpoints = {}
+        for name, group in sorted(groups.items()):
+            timings = sorted(sample[2] * 1000 for sample in group)
+            queries = [sample[3] for sample in group if sample[3] is not None]
+            endpoints[name] = {
+                'requests': len(group),
+                'errors': sum(sample[1] >= 400 for sample in group),
+                'p50': round(percentile(timings, 0.5), 2),
+                'p95': round(percentile(timings, 0.95), 2),
+                'p99': round(percentile(timings, 0.99), 2),
+                'queries': (
+                    round(sum(queries) / len(queries), 1)
+                    if queries else None
+                ),
+            }
+        return {
+            'requests': len(samples),
+            'seconds': round(elapsed, 3),
+            'rps': round(len(samples) / elapsed, 1),
+            'endpoints': endpoints,
+        }
+
+    def report(self, result, previous, threshold):
+        """Печатает результаты и возвращает эндпоинты с ростом p95."""
+        self.stdout.write(
+            f'{result["label"]} ({result["mode"]}): '
+            f'{result["requests"]} requests in {result["seconds"]}s, '
+            f'{result["rps"]} RPS'
+        )
+        self.stdout.write(
+            f'{"endpoint":<16}{"n":>6}{"err":>5}{"p50":>9}{"p95":>9}'
+            f'{"p99":>9}{"queries":>9}  p95 change'
+        )
+        regressions = []
+        before = previous['endpoints'] if previous else {}
+        for name, stats in result['endpoints'].items():
+            change = ''
+            if name in before and before[name]['p95']:
+                delta = (stats['p95'] / before[name]['p95'] - 1) * 100
+                change = f'{delta:+.0f}%'
+                if delta > threshold:
+                    regressions.append(name)
+                    change += ' regression'
+            queries = stats['queries']
+            if queries is None:
+                queries = '-'
+            self.stdout.write(
+                f'{name:<16}{stats["requests"]:>6}{stats["errors"]:>5}'
+                f'{stats["p50"]:>9}{stats["p95"]:>9}{stats["p99"]:>9}'
+                f'{queries:>9}  {change}'
+            )
+        if previous:
+            self.stdout.write(f'Compared with {previous["label"]}.')
+        return regressions
+
+    def load_previous(self, output, mode):
+        path = Path(output)
+        if not path.exists():
+            return None
+        previous = None
+        with path.open(encoding='utf8') as file:
+            for line in file:
+                if line.strip():
+                    result = json.loads(line)
+                    if result.get('mode') == mode:
+                        previous = result
+        return previous
+
+    def save(self, output, result):
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a', encoding='utf8') as file:
+            file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    def git_revision(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
@@ -0,0 +1,72 @@
+from csv import DictReader
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from api.filters import IngredientFilter
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures ingredient autocomplete on synthetic data. "
+        "All inserted rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--path', default='data/ingredients.csv'
+        )
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf8') as file:
+            base = [
+                (row['name'], row['measurement_unit'])
+                for row in DictReader(file)
+            ]
+
+        with transaction.atomic():
+            self.seed(base, options['rows'], options['batch_size'])
+            for query in ('аб', 'сол', 'мук', 'ое пюре'):
+                for mode in ('name', 'search'):
+                    self.measure(mode, query, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, base, rows, batch_size):
+        start = perf_counter()
+        batch = []
+        for number in range(rows):
+            name, unit = base[number % len(base)]
+            batch.append(Ingredient(
+                name=f'{name} {number // len(base)}',
+                measurement_unit=unit
+            ))
+            if len(batch) == batch_size:
+                Ingredient.objects.bulk_create(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch)
+        self.stdout.write(
+            f'Seeded {rows} rows in {perf_counter() - start:.2f}s'
+        )
+
+    def measure(self, mode, query, repeat):
+        request = RequestFactory().get('/', {mode: query})
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            queryset = IngredientFilter(
+                request.GET, queryset=Ingredient.objects.all()
+            ).qs
+            found = len(queryset[:20])
+            timings.append(perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f'{mode}={query!r}: {found} rows, '
+            f'median {timings[len(timings) // 2] * 1000:.2f}ms, '
+            f'max {timings[-1] * 1000:.2f}ms'
+        )
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import (
+    User,
+    Recipe,
+    Tag,
+    TagRecipe,
+    Favorite,
+    ShoppingList,
+    Follow
+)
+
+
+def hot_queries(user_id, tag_id):
+    """Частые запросы API и индексы, которыми они должны пользоваться."""
+    return (
+        (
+            'Избранное пользователя',
+            Favorite.objects.filter(user_id=user_id).values('recipe'),
+            ('favorite_user_recipe_idx',)
+        ),
+        (
+            'Список покупок пользователя',
+            ShoppingList.objects.filter(user_id=user_id).values('recipe'),
+            ('shoppinglist_user_recipe_idx',)
+        ),
+        (
+            'Подписки пользователя',
+            Follow.objects.filter(user_id=user_id).values('author'),
+            ('follow_user_author_idx',)
+        ),
+        (
+            'Рецепты по тегу',
+            TagRecipe.objects.filter(tag_id=tag_id).values('recipe'),
+            # SQLite хранит уникальные ограничения как autoindex.
+            ('tagrecipe_tag_recipe_uniq', 'sqlite_autoindex_recipes_tagrecipe')
+        ),
+        (
+            'Рецепты автора',
+            Recipe.objects.filter(author_id=user_id).order_by('-id')[:6],
+            ('recipe_author_id_idx',)
+        ),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN for the hot API queries and checks "
+        "that the planner uses the expected indexes. "
+        "Run it on a seeded database: on tiny tables PostgreSQL "
+        "prefers sequential scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print full query plans.'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        failed = []
+        for title, queryset, indexes in hot_queries(
+            user.id if user else 0, tag.id if tag else 0
+        ):
+            plan = queryset.explain()
+            used = any(index in plan for index in indexes)
+            if used:
+                self.stdout.write(
+                    self.style.SUCCESS(f'OK   {title}: {indexes[0]}')
+                )
+            else:
+                failed.append(title)
+                self.stdout.write(self.style.ERROR(
+                    f'FAIL {title}: {indexes[0]} не используется'
+                ))
+            if options['verbose_plans'] or not used:
+                self.stdout.write(plan)
+        if failed:
+            raise CommandError(
+                f'Индексы не используются: {", ".join(failed)}.'
+            )
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.images import IMAGE_FIELDS, delete_unused
+from recipes.models import Recipe
+from recipes.storage import content_storage
+
+DIRECTORIES = ('recipes/images', 'recipes/images/variants')
+
+
+class Command(BaseCommand):
+    help = "Deletes recipe images that no recipe references anymore"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=settings.IMAGE_RELEASE_MIN_AGE,
+            help='Skip files saved or reused less than this many seconds ago.'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        used = set()
+        for field in IMAGE_FIELDS:
+            used.update(
+                Recipe.objects.exclude(
+                    **{f'{field}__isnull': True}
+                ).values_list(field, flat=True).iterator()
+            )
+        candidates = {}
+        for directory in DIRECTORIES:
+            if not content_storage.exists(directory):
+                continue
+            for filename in content_storage.listdir(directory)[1]:
+                name = os.path.join(directory, filename)
+                if (
+                    name not in used
+                    and content_storage.age(name) >= options['min_age']
+                ):
+                    candidates[name] = content_storage.size(name)
+        if not options['dry_run']:
+            # Ссылки и возраст перепроверяются под блокировкой хранилища:
+            # файл мог снова понадобиться после чтения ссылок выше.
+            candidates = delete_unused(candidates, options['min_age'])
+        self.stdout.write(
+            f'Deleted files: {len(candidates)}, '
+            f'freed {sum(candidates.values()) / 1024 / 1024:.1f} MB'
+        )
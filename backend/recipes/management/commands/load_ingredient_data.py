@@ -1,22 +1,119 @@
-from django.core.management.base import BaseCommand
+import json
+import re
 from csv import DictReader
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes import catalog
 from recipes.models import Ingredient
 
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in DictReader(file):
+        yield row['name'], row['measurement_unit']
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    skip = re.compile(r'[\s,]*')
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов.')
+    position = 1
+    eof = False
+    while True:
+        position = skip.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Некорректный JSON файл.')
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield row['name'], row['measurement_unit']
+
+
+def insert_batch(cursor, rows):
+    """
+    Вставляет пачку ингредиентов одним многострочным INSERT,
+    пропуская уже существующие пары (название, единица измерения).
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(Ingredient._meta.get_field(field).column)
+        for field in ('name', 'measurement_unit')
+    )
+    values = ', '.join(['(%s, %s)'] * len(rows))
+    cursor.execute(
+        f'INSERT INTO {quote(Ingredient._meta.db_table)} ({columns}) '
+        f'VALUES {values} ON CONFLICT DO NOTHING',
+        [value for row in rows for value in row]
+    )
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = "Loads data from data/*.csv"
+    help = "Loads ingredients from data/ingredients.csv or .json"
 
-    def handle(self, *args, **options):
-        print("====== Loading data... =====")
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='data/ingredients.csv')
+        parser.add_argument('--batch-size', type=int, default=5000)
 
-        for row in DictReader(
-                open('data/ingredients.csv', encoding='utf8')):
-            ingredient, created = Ingredient.objects.get_or_create(
-                name=row['name'],
-                measurement_unit=row['measurement_unit']
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f'Поддерживаются файлы: {", ".join(READERS)}.'
             )
-            if created:
-                print(f'Ingredient {ingredient.name} created')
-            else:
-                print(f'Ingredient {ingredient.name} exists.')
-        print('===== Ingredients uploaded =====')
+        batch_size = options['batch_size']
+        self.stdout.write('====== Loading data... =====')
+
+        start = perf_counter()
+        before = Ingredient.objects.count()
+        read = 0
+        seen = set()
+        batch_size = connection.ops.bulk_batch_size(
+            ('name', 'measurement_unit'), range(batch_size)
+        )
+        with open(path, encoding='utf8') as file, transaction.atomic():
+            with connection.cursor() as cursor:
+                rows = reader(file)
+                while True:
+                    chunk = list(islice(rows, batch_size))
+                    if not chunk:
+                        break
+                    read += len(chunk)
+                    batch = []
+                    for row in chunk:
+                        if row not in seen:
+                            seen.add(row)
+                            batch.append(row)
+                    if batch:
+                        insert_batch(cursor, batch)
+        catalog.invalidate(Ingredient)
+
+        elapsed = perf_counter() - start
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'===== Ingredients uploaded: {read} rows read, '
+            f'{len(seen)} unique, {created} created '
+            f'in {elapsed:.2f}s ({read / elapsed:.0f} rows/s) ====='
+        ))
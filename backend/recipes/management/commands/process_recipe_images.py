@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Creates missing thumbnail and WebP variants of recipe images"
+
+    def handle(self, *args, **options):
+        pending = Recipe.objects.exclude(
+            Q(image__isnull=True) | Q(image='')
+        ).filter(
+            Q(image_webp__isnull=True) | Q(image_webp='')
+        ).values_list('id', flat=True)
+        processed = 0
+        for recipe_id in pending.iterator():
+            process_recipe_image(recipe_id)
+            processed += 1
+        self.stdout.write(f'Processed images: {processed}')
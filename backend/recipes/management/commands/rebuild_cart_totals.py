@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cart import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recalculates precomputed shopping cart totals"
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write('Shopping cart totals rebuilt.')
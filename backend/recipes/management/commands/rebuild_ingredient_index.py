@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ingredient_index import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the ingredient to recipes inverted index"
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write('Ingredient index rebuilt.')
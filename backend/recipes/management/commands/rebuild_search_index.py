@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.search import update_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of recipes"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            update_index()
+        self.stdout.write('Search index rebuilt.')
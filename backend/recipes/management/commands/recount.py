@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import versions
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculates favorite, cart, ingredient, "
+        "recipe and follower counters"
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount()
+        versions.bump_many([('recipes',), ('users',)])
+        self.stdout.write('Counters recalculated.')
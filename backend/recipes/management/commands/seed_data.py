@@ -0,0 +1,188 @@
+import random
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes import (
+    cart, catalog, counters, ingredient_index,
+    scores, search, versions
+)
+from recipes.models import (
+    User,
+    Recipe,
+    Ingredient,
+    Tag,
+    TagRecipe,
+    IngredientRecipe,
+    Favorite,
+    ShoppingList,
+    Follow
+)
+
+DISHES = (
+    'Суп', 'Салат', 'Пирог', 'Каша', 'Рагу', 'Запеканка',
+    'Омлет', 'Паста', 'Плов', 'Борщ', 'Блины', 'Котлеты',
+)
+STYLES = (
+    'домашний', 'быстрый', 'летний', 'острый', 'овощной',
+    'сырный', 'грибной', 'куриный', 'постный', 'праздничный',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds synthetic users, recipes, favorites, follows and carts "
+        "with bulk inserts for load tests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10_000)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = perf_counter()
+        with transaction.atomic():
+            ingredient_ids = self.ensure_ingredients(
+                options['ingredients'], options['prefix']
+            )
+            tag_ids = self.ensure_tags(options['prefix'])
+            user_ids = self.create_users(options['users'], options['prefix'])
+            recipe_ids = self.create_recipes(options['recipes'], user_ids)
+            self.link(
+                TagRecipe, 'recipe_id', 'tag_id',
+                recipe_ids, tag_ids, options['tags_per_recipe']
+            )
+            self.link(
+                IngredientRecipe, 'recipe_id', 'ingredients_id',
+                recipe_ids, ingredient_ids,
+                options['ingredients_per_recipe'], amount=(1, 500)
+            )
+            for model, count in (
+                (Favorite, options['favorites']),
+                (ShoppingList, options['carts']),
+            ):
+                self.link(
+                    model, 'user_id', 'recipe_id',
+                    user_ids, recipe_ids, count
+                )
+            self.link(
+                Follow, 'user_id', 'author_id',
+                user_ids, user_ids, options['follows']
+            )
+            self.refresh_derived()
+        self.stdout.write(f'Done in {perf_counter() - start:.2f}s')
+
+    def bulk_create(self, model, objects):
+        start = perf_counter()
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.stdout.write(
+            f'{model.__name__}: {len(objects)} rows '
+            f'in {perf_counter() - start:.2f}s'
+        )
+
+    def ensure_ingredients(self, count, prefix):
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            self.bulk_create(Ingredient, [
+                Ingredient(
+                    name=f'{prefix} ингредиент {number}',
+                    measurement_unit=self.random.choice(('г', 'мл', 'шт'))
+                )
+                for number in range(missing)
+            ])
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def ensure_tags(self, prefix):
+        missing = 3 - Tag.objects.count()
+        if missing > 0:
+            self.bulk_create(Tag, [
+                Tag(
+                    name=f'{prefix} тег {number}',
+                    slug=f'{prefix}-{number}',
+                    color=f'#{self.random.randrange(0x1000000):06x}'
+                )
+                for number in range(missing)
+            ])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_users(self, count, prefix):
+        offset = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(prefix)
+        self.bulk_create(User, [
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password
+            )
+            for number in range(offset, offset + count)
+        ])
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('-id').values_list('id', flat=True)[:count])
+
+    def create_recipes(self, count, user_ids):
+        self.bulk_create(Recipe, [
+            Recipe(
+                author_id=self.random.choice(user_ids),
+                name=(
+                    f'{self.random.choice(DISHES)} '
+                    f'{self.random.choice(STYLES)} {number}'
+                ),
+                text=' '.join(self.random.choices(STYLES, k=20)),
+                cooking_time=self.random.randint(5, 180)
+            )
+            for number in range(count)
+        ])
+        return list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).values_list('id', flat=True))
+
+    def link(self, model, source, target, source_ids, target_ids,
+             count, amount=None):
+        """Связывает каждый source_id со count случайными target_ids."""
+        count = min(count, len(target_ids))
+        objects = []
+        for source_id in source_ids:
+            for target_id in self.random.sample(target_ids, count):
+                if model is Follow and target_id == source_id:
+                    continue
+                fields = {source: source_id, target: target_id}
+                if amount is not None:
+                    fields['amount'] = self.random.randint(*amount)
+                objects.append(model(**fields))
+        self.bulk_create(model, objects)
+
+    def refresh_derived(self):
+        """
+        Пересчитывает данные, которые обычно обновляют сигналы:
+        bulk_create их не отправляет.
+        """
+        start = perf_counter()
+        counters.recount()
+        scores.refresh()
+        ingredient_index.rebuild()
+        cart.rebuild()
+        search.update_index()
+        catalog.invalidate(Ingredient)
+        catalog.invalidate(Tag)
+        versions.bump_many([('recipes',), ('users',)])
+        self.stdout.write(
+            f'Derived data refreshed in {perf_counter() - start:.2f}s'
+        )
@@ -0,0 +1,16 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from recipes import scores
+
+
+class Command(BaseCommand):
+    help = "Refreshes precomputed popular and trending recipe scores"
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        changed = scores.refresh()
+        self.stdout.write(
+            f'Updated scores: {changed} in {perf_counter() - start:.2f}s'
+        )
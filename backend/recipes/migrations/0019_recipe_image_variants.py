@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_auto_20261018_0628'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, default=None, null=True, upload_to='recipes/images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, default=None, null=True, upload_to='recipes/images/variants/'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:31
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, null=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/images/'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, default=None, null=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/images/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, default=None, null=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/images/variants/'),
+        ),
+    ]
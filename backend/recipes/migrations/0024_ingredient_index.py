@@ -0,0 +1,65 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:38
+
+from array import array
+from itertools import groupby
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_index(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    IngredientIndex = apps.get_model('recipes', 'IngredientIndex')
+    Recipe.objects.update(ingredients_count=Coalesce(
+        Subquery(
+            IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    ))
+    rows = IngredientRecipe.objects.order_by(
+        'ingredients_id', 'recipe_id'
+    ).values_list('ingredients_id', 'recipe_id', 'recipe__ingredients_count')
+    IngredientIndex.objects.bulk_create(
+        (
+            IngredientIndex(
+                ingredient_id=ingredient_id,
+                postings=array(
+                    'I', (value for row in group for value in row[1:])
+                ).tobytes()
+            )
+            for ingredient_id, group in groupby(
+                rows.iterator(), key=lambda row: row[0]
+            )
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientIndex',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_index', serialize=False, to='recipes.ingredient')),
+                ('postings', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:55
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_totals(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    CartTotal = apps.get_model('recipes', 'CartTotal')
+    rows = IngredientRecipe.objects.filter(
+        recipe__shopper__isnull=False
+    ).values(
+        'recipe__shopper__user_id', 'ingredients_id'
+    ).annotate(total_amount=Sum('amount')).order_by()
+    CartTotal.objects.bulk_create(
+        (
+            CartTotal(
+                user_id=row['recipe__shopper__user_id'],
+                ingredient_id=row['ingredients_id'],
+                amount=row['total_amount']
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0024_ingredient_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='recipes.ingredient')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='carttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='carttotal_user_ingredient_uniq'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from array import array
+
+from django.db import migrations
+
+TYPECODE = 'I'
+
+
+def convert(apps, transform):
+    IngredientIndex = apps.get_model('recipes', 'IngredientIndex')
+    rows = list(IngredientIndex.objects.all())
+    for row in rows:
+        values = array(TYPECODE)
+        values.frombytes(row.postings)
+        row.postings = array(TYPECODE, transform(values)).tobytes()
+    IngredientIndex.objects.bulk_update(rows, ('postings',), batch_size=500)
+
+
+def drop_totals(apps, schema_editor):
+    convert(apps, lambda values: values[0::2])
+
+
+def add_totals(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    totals = dict(Recipe.objects.values_list('pk', 'ingredients_count'))
+    convert(apps, lambda values: (
+        value for recipe_id in values
+        for value in (recipe_id, totals.get(recipe_id, 0))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0026_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_totals, add_totals),
+    ]
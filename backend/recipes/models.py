@@ -1,7 +1,10 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, Sum
 
 from users.models import MyUser as User
+from .storage import content_storage
 
 
 class Tag(models.Model):
@@ -40,10 +43,26 @@ class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='recipes')
+        related_name='recipes',
+        db_index=False)
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=content_storage,
+        null=True,
+        default=None
+    )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/images/variants/',
+        storage=content_storage,
         null=True,
+        blank=True,
+        default=None
+    )
+    image_webp = models.ImageField(
+        upload_to='recipes/images/variants/',
+        storage=content_storage,
+        null=True,
+        blank=True,
         default=None
     )
     cooking_time = models.PositiveSmallIntegerField(
@@ -59,12 +78,26 @@ class Recipe(models.Model):
         through='IngredientRecipe',
         related_name='recipes',
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    shopping_count = models.PositiveIntegerField(default=0, editable=False)
+    ingredients_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+        ]
 
 
 class TagRecipe(models.Model):
@@ -73,7 +106,8 @@ class TagRecipe(models.Model):
     tag = models.ForeignKey(
         Tag,
         related_name='recipe_tags',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -81,10 +115,36 @@ class TagRecipe(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'recipe'],
+                name='tagrecipe_tag_recipe_uniq'
+            ),
+        ]
+
     def __str__(self):
         return f'{self.recipe}: {self.tag}'
 
 
+class IngredientRecipeQuerySet(models.QuerySet):
+    """Запросы к связной модели ингредиента и рецепта."""
+
+    def cart_totals(self):
+        """
+        Суммы ингредиентов по спискам покупок всех пользователей
+        с группировкой на стороне БД.
+        """
+        return self.filter(
+            recipe__shopper__isnull=False
+        ).values(
+            'recipe__shopper__user_id',
+            'ingredients_id'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by()
+
+
 class IngredientRecipe(models.Model):
     """Связанная модель рецепта и ингредиента."""
 
@@ -102,6 +162,8 @@ class IngredientRecipe(models.Model):
         validators=[MinValueValidator(1)],
     )
 
+    objects = IngredientRecipeQuerySet.as_manager()
+
     class Meta:
         unique_together = ('recipe', 'ingredients')
 
@@ -109,23 +171,49 @@ class IngredientRecipe(models.Model):
         return f'{self.recipe}: {self.ingredients}, {self.amount}'
 
 
+class IngredientIndex(models.Model):
+    """
+    Обратный индекс ингредиентов: id рецептов с ингредиентом,
+    упакованные по возрастанию в массив 32-битных целых.
+    """
+
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recipe_index'
+    )
+    postings = models.BinaryField(default=b'')
+
+    def __str__(self):
+        return str(self.ingredient)
+
+
 class Follow(models.Model):
     """Модель подписки."""
 
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
         unique_together = ('author', 'user')
         ordering = ['author']
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -134,17 +222,26 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='favorite_recipe'
+        related_name='favorite_recipe',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
-        related_name='favorite_follower'
+        related_name='favorite_follower',
+        db_index=False
     )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('recipe', 'user')
         ordering = ['recipe']
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'],
+                name='favorite_user_recipe_idx'
+            ),
+        ]
 
 
 class ShoppingList(models.Model):
@@ -153,14 +250,114 @@ class ShoppingList(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='shopping_list'
+        related_name='shopping_list',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
-        related_name='shopper'
+        related_name='shopper',
+        db_index=False
     )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('recipe', 'user')
         ordering = ['recipe']
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'],
+                name='shoppinglist_user_recipe_idx'
+            ),
+        ]
+
+
+class CartTotalQuerySet(models.QuerySet):
+    """Запросы к суммам списка покупок."""
+
+    def shopping_list(self, user):
+        """Суммы ингредиентов списка покупок пользователя по названию."""
+        return self.filter(user=user).values(
+            'ingredient_id',
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('ingredient__name')
+
+
+class CartTotal(models.Model):
+    """
+    Сумма ингредиента по всем рецептам из списка покупок пользователя.
+    Поддерживается модулем recipes.cart.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+        db_index=False
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals'
+    )
+    amount = models.IntegerField(default=0)
+
+    objects = CartTotalQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='carttotal_user_ingredient_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient}, {self.amount}'
+
+
+class RecipeScore(models.Model):
+    """
+    Предрассчитанные оценки популярности рецепта.
+    Обновляются командой update_recipe_scores.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    popular = models.PositiveIntegerField(default=0)
+    trending = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'],
+                name='recipescore_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='recipescore_trending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular}/{self.trending}'
+
+
+class DataVersion(models.Model):
+    """
+    Версия набора данных - метка времени его последнего изменения.
+    Общая для всех процессов, см. recipes.versions.
+    """
+
+    key = models.CharField(primary_key=True, max_length=100)
+    version = models.FloatField()
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
@@ -0,0 +1,91 @@
+"""
+Оценки популярности рецептов.
+
+popular - взвешенная сумма добавлений в избранное и в список покупок
+за всё время, берётся из счётчиков рецепта. trending - та же сумма
+за последние TRENDING_DAYS дней. Пересчёт записывает только
+изменившиеся оценки, поэтому его можно часто запускать по расписанию.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import versions
+from .models import Recipe, RecipeScore, Favorite, ShoppingList
+
+FAVORITE_WEIGHT = 2
+SHOPPING_WEIGHT = 1
+BATCH_SIZE = 1000
+
+
+def create_missing():
+    """Создаёт пустые оценки для рецептов, у которых их ещё нет."""
+    missing = Recipe.objects.filter(
+        score__isnull=True
+    ).values_list('pk', flat=True)
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def save_changed(field, values):
+    """Записывает оценки {recipe_id: значение} пачками."""
+    now = timezone.now()
+    scores = [
+        RecipeScore(recipe_id=pk, updated_at=now, **{field: value})
+        for pk, value in values.items()
+    ]
+    RecipeScore.objects.bulk_update(
+        scores, (field, 'updated_at'), batch_size=BATCH_SIZE
+    )
+    return len(scores)
+
+
+def refresh_popular():
+    changed = RecipeScore.objects.annotate(
+        expected=(
+            F('recipe__favorites_count') * FAVORITE_WEIGHT
+            + F('recipe__shopping_count') * SHOPPING_WEIGHT
+        )
+    ).exclude(popular=F('expected')).values_list('recipe_id', 'expected')
+    return save_changed('popular', dict(changed.iterator()))
+
+
+def refresh_trending():
+    since = timezone.now() - timedelta(days=settings.TRENDING_DAYS)
+    expected = Counter()
+    for model, weight in (
+        (Favorite, FAVORITE_WEIGHT),
+        (ShoppingList, SHOPPING_WEIGHT)
+    ):
+        activity = model.objects.filter(
+            created_at__gte=since
+        ).order_by().values('recipe').annotate(total=Count('pk'))
+        for row in activity.iterator():
+            expected[row['recipe']] += row['total'] * weight
+    current = dict(RecipeScore.objects.filter(
+        trending__gt=0
+    ).values_list('recipe_id', 'trending'))
+    current.update(RecipeScore.objects.filter(
+        recipe_id__in=expected
+    ).values_list('recipe_id', 'trending'))
+    changed = {
+        pk: expected.get(pk, 0)
+        for pk, value in current.items()
+        if value != expected.get(pk, 0)
+    }
+    return save_changed('trending', changed)
+
+
+def refresh():
+    """Пересчитывает изменившиеся оценки, возвращает их количество."""
+    create_missing()
+    changed = refresh_popular() + refresh_trending()
+    if changed:
+        versions.bump('recipes')
+    return changed
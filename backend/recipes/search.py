@@ -0,0 +1,121 @@
+"""
+Полнотекстовый поиск рецептов.
+
+В PostgreSQL по названию, ингредиентам и описанию рецепта строится
+tsvector, который хранится в Recipe.search_vector под GIN-индексом.
+В SQLite те же поля пишутся в виртуальную таблицу FTS5
+recipes_recipe_fts с rowid, равным id рецепта. Индекс обновляется
+после сохранения рецепта, а команда rebuild_search_index строит
+его заново целиком.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, When
+
+CONFIG = 'russian'
+SQLITE_LIMIT = 1000
+
+POSTGRES_UPDATE = f"""
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('{CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{CONFIG}', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS item
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = item.ingredients_id
+            WHERE item.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{CONFIG}', recipe.text), 'C')
+"""
+
+SQLITE_INSERT = """
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS item
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = item.ingredients_id
+        WHERE item.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+"""
+
+
+def placeholders(ids):
+    return ', '.join(['%s'] * len(ids))
+
+
+def update_index(ids=None):
+    """Обновляет поисковый индекс рецептов ids или всех рецептов."""
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            if ids is None:
+                cursor.execute(POSTGRES_UPDATE)
+            else:
+                cursor.execute(
+                    POSTGRES_UPDATE + ' WHERE recipe.id = ANY(%s)', [ids]
+                )
+        elif connection.vendor == 'sqlite':
+            if ids is None:
+                cursor.execute('DELETE FROM recipes_recipe_fts')
+                cursor.execute(SQLITE_INSERT)
+            else:
+                remove_sqlite(cursor, ids)
+                cursor.execute(
+                    SQLITE_INSERT
+                    + f' WHERE recipe.id IN ({placeholders(ids)})',
+                    ids
+                )
+
+
+def remove_sqlite(cursor, ids):
+    cursor.execute(
+        f'DELETE FROM recipes_recipe_fts WHERE rowid IN ({placeholders(ids)})',
+        ids
+    )
+
+
+def remove_from_index(ids):
+    """Удаляет рецепты из индекса FTS5 (в PostgreSQL он хранится в строке)."""
+    ids = list(ids)
+    if connection.vendor == 'sqlite' and ids:
+        with connection.cursor() as cursor:
+            remove_sqlite(cursor, ids)
+
+
+def fts5_query(value):
+    """Запрос FTS5 из слов пользователя: все слова, поиск по префиксу."""
+    words = re.findall(r'\w+', value.lower())
+    return ' AND '.join(f'"{word}"*' for word in words)
+
+
+def search(queryset, value):
+    """Фильтрует рецепты по запросу и сортирует их по релевантности."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+    query = fts5_query(value)
+    if connection.vendor != 'sqlite' or not query:
+        return queryset.none()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM recipes_recipe_fts '
+            'WHERE recipes_recipe_fts MATCH %s '
+            'ORDER BY bm25(recipes_recipe_fts, 10.0, 5.0, 1.0) LIMIT %s',
+            [query, SQLITE_LIMIT]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(Case(
+        *(When(id=pk, then=position) for position, pk in enumerate(ids)),
+        output_field=IntegerField()
+    ), '-id')
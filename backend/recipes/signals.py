@@ -0,0 +1,263 @@
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import (
+    cart, catalog, counters, images,
+    ingredient_index, search, versions
+)
+from .models import (
+    User,
+    Recipe,
+    RecipeScore,
+    Ingredient,
+    IngredientRecipe,
+    Tag,
+    TagRecipe,
+    Favorite,
+    ShoppingList,
+    Follow
+)
+
+
+class DeletingRecipes(threading.local):
+    """
+    Рецепты, которые удаляются в текущем потоке. Производные данные
+    их каскада обновляет forget_deleted_recipe, поэтому получатели
+    сигналов удаляемых строк каскада их пропускают.
+    """
+
+    def __init__(self):
+        self.ids = set()
+
+    def __contains__(self, instance):
+        return getattr(instance, 'recipe_id', None) in self.ids
+
+
+deleting_recipes = DeletingRecipes()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(partial(catalog.invalidate, sender))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+def bump_recipes_version(sender, **kwargs):
+    versions.bump_on_commit('recipes')
+
+
+@receiver(m2m_changed, sender=TagRecipe)
+def bump_recipes_version_on_tags_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        versions.bump_on_commit('recipes')
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_images(sender, instance, **kwargs):
+    images.release_on_commit(
+        getattr(instance, field).name for field in images.IMAGE_FIELDS
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, **kwargs):
+    transaction.on_commit(partial(search.update_index, [instance.pk]))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_index(sender, instance, created, **kwargs):
+    if not created:
+        ids = list(instance.recipes.values_list('id', flat=True))
+        transaction.on_commit(partial(search.update_index, ids))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_from_index([instance.pk])
+
+
+# Поля пользователя, которые попадают в ответы с рецептами.
+PROFILE_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+def profile(user):
+    return tuple(getattr(user, name) for name in PROFILE_FIELDS)
+
+
+@receiver(pre_save, sender=User)
+def remember_profile_change(sender, instance, update_fields=None, **kwargs):
+    instance.profile_changed = False
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        PROFILE_FIELDS
+    ):
+        return
+    previous = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*PROFILE_FIELDS).first()
+    instance.profile_changed = (
+        previous is not None and previous != profile(instance)
+    )
+
+
+@receiver(post_save, sender=User)
+def bump_users_version(sender, instance, created, **kwargs):
+    # Новый пользователь ещё не автор рецептов, а вход (last_login)
+    # и смена пароля не меняют ответы: версию меняет только профиль.
+    if not created and instance.profile_changed:
+        versions.bump_on_commit('users')
+
+
+@receiver(post_delete, sender=User)
+def bump_users_version_on_delete(sender, **kwargs):
+    versions.bump_on_commit('users')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_user_state_version(sender, instance, **kwargs):
+    versions.bump_on_commit('user-state', instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        counters.change(User, 'recipes_count', [instance.author_id])
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(pre_delete, sender=Recipe)
+def forget_deleted_recipe(sender, instance, **kwargs):
+    """
+    Убирает удаляемый рецепт из индекса ингредиентов и из сумм списков
+    покупок сразу за весь каскад, пока его строки ещё не удалены.
+    """
+    deleting_recipes.ids.add(instance.pk)
+    amounts = dict(IngredientRecipe.objects.filter(
+        recipe=instance
+    ).values_list('ingredients_id', 'amount'))
+    ingredient_index.update_on_commit(instance.pk, removed=amounts)
+    cart.change_recipe(
+        instance.pk,
+        {ingredient_id: -amount for ingredient_id, amount in amounts.items()}
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    # Строки каскада удаляются раньше рецепта.
+    deleting_recipes.ids.discard(instance.pk)
+    counters.change(User, 'recipes_count', [instance.author_id], -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        model, field, attname = counters.RELATIONS[sender]
+        counters.change(model, field, [getattr(instance, attname)])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Follow)
+def decrement_counter(sender, instance, **kwargs):
+    if instance in deleting_recipes:
+        return
+    model, field, attname = counters.RELATIONS[sender]
+    counters.change(model, field, [getattr(instance, attname)], -1)
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def remember_replaced_ingredient(sender, instance, **kwargs):
+    instance.previous_ingredients_id = None
+    instance.previous_amount = 0
+    if instance.pk is not None:
+        previous = IngredientRecipe.objects.filter(
+            pk=instance.pk
+        ).values_list('ingredients_id', 'amount').first()
+        if previous is not None:
+            instance.previous_ingredients_id, instance.previous_amount = (
+                previous
+            )
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def index_saved_ingredient(sender, instance, created, **kwargs):
+    if created:
+        ingredient_index.change(
+            instance.recipe_id, added=[instance.ingredients_id]
+        )
+    elif instance.previous_ingredients_id != instance.ingredients_id:
+        ingredient_index.update_on_commit(
+            instance.recipe_id,
+            added=[instance.ingredients_id],
+            removed=[instance.previous_ingredients_id]
+        )
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def index_removed_ingredient(sender, instance, **kwargs):
+    if instance in deleting_recipes:
+        return
+    ingredient_index.change(
+        instance.recipe_id, removed=[instance.ingredients_id]
+    )
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        cart.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    if instance in deleting_recipes:
+        return
+    cart.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def update_cart_totals(sender, instance, created, **kwargs):
+    changes = {instance.ingredients_id: instance.amount}
+    if not created:
+        changes = {instance.previous_ingredients_id: -instance.previous_amount}
+        changes[instance.ingredients_id] = (
+            changes.get(instance.ingredients_id, 0) + instance.amount
+        )
+    cart.change_recipe(instance.recipe_id, changes)
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def remove_ingredient_from_cart_totals(sender, instance, **kwargs):
+    if instance in deleting_recipes:
+        return
+    cart.change_recipe(
+        instance.recipe_id, {instance.ingredients_id: -instance.amount}
+    )
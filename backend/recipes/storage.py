@@ -0,0 +1,61 @@
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, именующее файлы по хэшу содержимого.
+    Повторная загрузка того же файла не создаёт копию,
+    а возвращает имя уже сохранённого файла и обновляет время его
+    изменения: по нему удаление файлов пропускает недавно
+    использованные. Сохранение и удаление файлов по ссылкам
+    выполняются под общей блокировкой (см. lock).
+    """
+
+    chunk_size = 64 * 1024
+    lock_name = '.content-lock'
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest()[:32] + extension)
+
+    @contextmanager
+    def lock(self):
+        """Блокировка хранилища, общая для всех процессов на хосте."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, self.lock_name), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.get_content_name(name, content)
+        with self.lock():
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+            return super().save(name, content, max_length)
+
+    def age(self, name):
+        """Сколько секунд назад файл был сохранён или использован."""
+        return time.time() - self.get_modified_time(name).timestamp()
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,110 @@
+"""
+Версии данных.
+
+Версия - метка времени последнего изменения набора данных.
+Она входит в ключи кэша и валидаторы HTTP (ETag, Last-Modified),
+поэтому смена версии делает устаревшими все производные значения.
+
+Версии хранятся в таблице DataVersion, общей для веб-воркеров,
+фонового обработчика изображений и management-команд. Прочитанная
+версия держится в кэше Django VERSION_CACHE_TIMEOUT секунд: смена
+версии в своём процессе видна сразу, в другом процессе с кэшем
+в памяти - не позже чем через этот срок. Набор, который ещё
+ни разу не менялся, имеет версию 0.
+
+Изменения в транзакции меняют версии после её фиксации (bump_on_commit),
+все сразу одним запросом, сколько бы строк транзакция ни затронула.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import DataVersion
+
+
+def version_key(*parts):
+    return 'version:' + ':'.join(str(part) for part in parts)
+
+
+def get_versions(*keys):
+    """
+    Текущие версии наборов данных keys (кортежей частей ключа) списком.
+    Версии, которых нет в кэше, читаются одним запросом к БД.
+    """
+    names = [version_key(*parts) for parts in keys]
+    found = cache.get_many(names)
+    missing = [name for name in names if name not in found]
+    if missing:
+        stored = dict.fromkeys(missing, 0.0)
+        stored.update(DataVersion.objects.filter(
+            key__in=missing
+        ).values_list('key', 'version'))
+        cache.set_many(stored, settings.VERSION_CACHE_TIMEOUT)
+        found.update(stored)
+    return [found[name] for name in names]
+
+
+def get_version(*parts):
+    """Текущая версия набора данных."""
+    return get_versions(parts)[0]
+
+
+def bump_many(keys):
+    """Выставляет новую версию сразу нескольким наборам данных."""
+    now = time.time()
+    names = [version_key(*parts) for parts in keys]
+    quote = connection.ops.quote_name
+    table = quote(DataVersion._meta.db_table)
+    key, version = (
+        quote(DataVersion._meta.get_field(name).column)
+        for name in ('key', 'version')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({key}, {version}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(names))} '
+            f'ON CONFLICT ({key}) DO UPDATE '
+            f'SET {version} = excluded.{version}',
+            [value for name in names for value in (name, now)]
+        )
+    cache.set_many(
+        dict.fromkeys(names, now), settings.VERSION_CACHE_TIMEOUT
+    )
+
+
+def bump(*parts):
+    """Выставляет набору данных новую версию."""
+    bump_many([parts])
+
+
+class PendingBumps(threading.local):
+    """
+    Наборы данных, версии которых нужно сменить после фиксации
+    транзакции текущего потока.
+    """
+
+    def __init__(self):
+        self.keys = {}
+
+    def flush(self):
+        if self.keys:
+            keys, self.keys = list(self.keys), {}
+            bump_many(keys)
+
+
+pending = PendingBumps()
+
+
+def bump_on_commit(*parts):
+    """
+    Выставляет набору данных новую версию после фиксации транзакции.
+    Первый обработчик после фиксации меняет все накопленные версии
+    одним запросом, остальные ничего не делают. Версии из отменённой
+    транзакции сменятся вместе со следующими: лишняя смена версии
+    только сбрасывает кэш.
+    """
+    pending.keys[parts] = None
+    transaction.on_commit(pending.flush)
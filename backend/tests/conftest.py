@@ -0,0 +1,140 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIClient
+
+from recipes import images
+from recipes.models import (
+    User, Recipe, Ingredient, Tag, IngredientRecipe
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def image_tasks(monkeypatch):
+    """
+    Id рецептов, поставленных в очередь обработки изображений.
+    В тестах задачи не уходят в пул потоков, их выполняет сам тест.
+    """
+    tasks = []
+    monkeypatch.setattr(images, 'schedule', tasks.append)
+    return tasks
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        email='user@example.com', username='user', password='password',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create_user(
+        email='author@example.com', username='author', password='password',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(name='Завтрак', slug='breakfast', color='#111')
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(
+            name=f'ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(10)
+    ]
+
+
+@pytest.fixture
+def pantry(db):
+    """Ингредиенты для рецептов с длинным составом."""
+    return [
+        Ingredient.objects.create(
+            name=f'продукт {number}', measurement_unit='г'
+        )
+        for number in range(60)
+    ]
+
+
+@pytest.fixture
+def png_image():
+    """Изображение 1x2 в формате поля image рецепта."""
+    return (
+        'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieyw'
+        'aAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQV'
+        'QImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+    )
+
+
+@pytest.fixture
+def recipe_payload(tag):
+    """Тело запроса на создание или изменение рецепта."""
+    def recipe_payload(ingredients, amount=1, **fields):
+        return {
+            'name': 'Суп', 'text': 'Текст', 'cooking_time': 10,
+            'tags': [tag.id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient in ingredients
+            ],
+            **fields,
+        }
+
+    return recipe_payload
+
+
+@pytest.fixture
+def make_recipe(author, tag, ingredients):
+    def make_recipe(count=3, **fields):
+        recipe = Recipe.objects.create(**{
+            'author': author, 'name': 'Суп', 'text': 'Текст',
+            'cooking_time': 10, **fields
+        })
+        recipe.tags.set([tag])
+        for number in range(count):
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredients=ingredients[number],
+                amount=number + 1
+            )
+        return recipe
+
+    return make_recipe
@@ -0,0 +1,94 @@
+import pytest
+
+from recipes import batch
+from recipes.models import CartTotal, Favorite, Follow, ShoppingList
+
+
+@pytest.fixture
+def recipes(make_recipe):
+    return [make_recipe(count=2), make_recipe(count=3)]
+
+
+def test_shopping_cart_batch(client, user, recipes):
+    first, second = recipes
+    ShoppingList.objects.create(user=user, recipe=second)
+    url = '/api/recipes/shopping_cart_batch/'
+
+    response = client.post(
+        url, {'ids': [first.id, second.id, 999999, first.id]}, format='json'
+    )
+
+    assert response.json() == {
+        str(first.id): 'added', str(second.id): 'exists', '999999': 'not_found'
+    }
+    first.refresh_from_db()
+    assert first.shopping_count == 1
+    assert sum(user.cart_totals.values_list('amount', flat=True)) == 9
+
+    response = client.delete(
+        url, {'ids': [first.id, second.id, 999999]}, format='json'
+    )
+
+    assert response.json() == {
+        str(first.id): 'removed', str(second.id): 'removed',
+        '999999': 'missing'
+    }
+    first.refresh_from_db()
+    assert first.shopping_count == 0
+    assert not user.cart_totals.exists()
+
+
+def test_favorite_and_subscribe_batch(client, user, author, recipes):
+    response = client.post(
+        '/api/recipes/favorite_batch/',
+        {'ids': [recipe.id for recipe in recipes]}, format='json'
+    )
+
+    assert set(response.json().values()) == {'added'}
+    assert Favorite.objects.filter(user=user).count() == 2
+
+    response = client.post(
+        '/api/users/subscribe_batch/',
+        {'ids': [user.id, author.id]}, format='json'
+    )
+
+    assert response.json() == {str(user.id): 'self', str(author.id): 'added'}
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert client.delete(
+        '/api/users/subscribe_batch/', {'ids': [author.id]}, format='json'
+    ).json() == {str(author.id): 'removed'}
+    assert not Follow.objects.exists()
+
+
+@pytest.mark.parametrize('ids', [[], ['x'], list(range(1, 102))])
+def test_invalid_ids(client, ids):
+    assert client.post(
+        '/api/recipes/favorite_batch/', {'ids': ids}, format='json'
+    ).status_code == 400
+
+
+def test_requires_authentication(anon_client, recipes):
+    assert anon_client.post(
+        '/api/recipes/favorite_batch/', {'ids': [recipes[0].id]},
+        format='json'
+    ).status_code == 401
+
+
+def test_links_created_concurrently_are_not_counted_twice(user, recipes):
+    recipe = recipes[0]
+    # Связь вставлена без сигналов, как будто её создал параллельный
+    # запрос между проверкой id и вставкой.
+    ShoppingList.objects.bulk_create([ShoppingList(user=user, recipe=recipe)])
+
+    assert batch.add(ShoppingList, user, [recipe.id]) == {recipe.id: 'exists'}
+    recipe.refresh_from_db()
+    assert recipe.shopping_count == 0
+    assert not CartTotal.objects.exists()
+
+    ShoppingList.objects.filter(user=user).delete()
+    assert batch.remove(ShoppingList, user, [recipe.id]) == {
+        recipe.id: 'missing'
+    }
+    recipe.refresh_from_db()
+    assert recipe.shopping_count == 0
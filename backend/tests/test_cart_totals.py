@@ -0,0 +1,103 @@
+from collections import Counter
+
+import pytest
+from rest_framework.test import APIClient
+
+from recipes import cart
+from recipes.models import CartTotal, IngredientRecipe, ShoppingList
+
+
+def totals(user):
+    return dict(CartTotal.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'amount'))
+
+
+def expected(user):
+    amounts = Counter()
+    for ingredient_id, amount in IngredientRecipe.objects.filter(
+        recipe__shopper__user=user
+    ).values_list('ingredients_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return dict(amounts)
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+def test_cart_changes_update_totals(client, user, make_recipe):
+    first, second = make_recipe(count=3), make_recipe(count=2)
+
+    assert client.post(
+        f'/api/recipes/{first.id}/shopping_cart/'
+    ).status_code == 201
+    assert client.post(
+        f'/api/recipes/{second.id}/shopping_cart/'
+    ).status_code == 201
+    assert totals(user) == expected(user) != {}
+
+    assert client.delete(
+        f'/api/recipes/{second.id}/shopping_cart/'
+    ).status_code == 204
+    assert totals(user) == expected(user)
+
+    first.delete()
+    assert totals(user) == {}
+
+
+def test_recipe_changes_update_totals_of_every_cart(
+    client, author_client, user, author, tag, ingredients, make_recipe
+):
+    recipe = make_recipe(count=3)
+    for owner in (user, author):
+        ShoppingList.objects.create(user=owner, recipe=recipe)
+
+    response = author_client.patch(f'/api/recipes/{recipe.id}/', {
+        'name': 'Суп', 'text': 'Текст', 'cooking_time': 10,
+        'tags': [tag.id],
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 10},
+            {'id': ingredients[5].id, 'amount': 3},
+        ],
+    }, format='json')
+
+    assert response.status_code == 200, response.content
+    for owner in (user, author):
+        assert totals(owner) == {ingredients[0].id: 10, ingredients[5].id: 3}
+
+    item = IngredientRecipe.objects.get(
+        recipe=recipe, ingredients=ingredients[5]
+    )
+    item.ingredients = ingredients[6]
+    item.amount = 1
+    item.save()
+    assert totals(user) == expected(user)
+
+    ingredients[0].delete()
+    assert totals(user) == expected(user) == {ingredients[6].id: 1}
+
+
+def test_summary_and_rebuild(client, anon_client, user, make_recipe):
+    for _ in range(2):
+        ShoppingList.objects.create(user=user, recipe=make_recipe(count=2))
+
+    response = client.get('/api/recipes/shopping_cart_summary/')
+
+    assert response.json() == [
+        {'id': row['ingredient_id'], 'name': row['name'],
+         'measurement_unit': row['measurement_unit'], 'amount': row['amount']}
+        for row in CartTotal.objects.shopping_list(user)
+    ]
+    assert [row['amount'] for row in response.json()] == [2, 4]
+    assert anon_client.get(
+        '/api/recipes/shopping_cart_summary/'
+    ).status_code == 401
+
+    before = totals(user)
+    CartTotal.objects.all().delete()
+    cart.rebuild()
+    assert totals(user) == before
@@ -0,0 +1,78 @@
+import copy
+
+from django.core.cache import cache
+
+from recipes import catalog, versions
+from recipes.models import Ingredient, Recipe
+
+
+def test_recipe_ids_are_checked_with_one_cache_read_per_catalog(
+    client, tag, ingredients, recipe_payload, monkeypatch
+):
+    calls = []
+    get_objects = catalog.get_objects
+
+    def counted(model, pks):
+        calls.append((model, set(pks)))
+        return get_objects(model, pks)
+
+    monkeypatch.setattr(catalog, 'get_objects', counted)
+    response = client.post(
+        '/api/recipes/', recipe_payload(ingredients), format='json'
+    )
+
+    assert response.status_code == 201, response.content
+    assert calls == [
+        (type(tag), {tag.id}),
+        (Ingredient, {ingredient.id for ingredient in ingredients}),
+    ]
+
+
+def test_unknown_and_new_ingredients(client, ingredients, recipe_payload):
+    payload = recipe_payload(ingredients[:1])
+    payload['ingredients'].append({'id': 999999, 'amount': 1})
+
+    response = client.post('/api/recipes/', payload, format='json')
+
+    assert response.status_code == 400
+    assert response.json()['ingredients'][1]['id']
+    assert not Recipe.objects.exists()
+
+    created = Ingredient.objects.create(name='новый', measurement_unit='г')
+    payload['ingredients'][1]['id'] = created.id
+    assert client.post(
+        '/api/recipes/', payload, format='json'
+    ).status_code == 201
+
+
+def test_ingredient_detail_from_cache(
+    anon_client, ingredients, django_capture_on_commit_callbacks
+):
+    ingredient = ingredients[0]
+    url = f'/api/ingredients/{ingredient.id}/'
+
+    assert anon_client.get(url).json()['name'] == ingredient.name
+    ingredient.name = 'новое'
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient.save()
+    assert anon_client.get(url).json()['name'] == 'новое'
+    assert anon_client.get('/api/ingredients/999999/').status_code == 404
+    assert anon_client.get('/api/ingredients/abc/').status_code == 404
+
+
+def test_catalog_entries_do_not_evict_versions(settings, ingredients):
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['OPTIONS']['MAX_ENTRIES'] = 5
+    settings.CACHES = caches
+    versions.get_version('recipes')
+
+    objects = catalog.get_objects(
+        Ingredient, [ingredient.id for ingredient in ingredients]
+    )
+
+    assert len(objects) == len(ingredients)
+    assert cache.get(versions.version_key('recipes')) is not None
+    assert catalog.cache.get_many([
+        f'{catalog.make_key(Ingredient, "object")}:{ingredient.id}'
+        for ingredient in ingredients
+    ]).keys()
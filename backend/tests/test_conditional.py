@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from recipes import catalog, versions
+from recipes.models import DataVersion, Tag
+
+
+@pytest.mark.parametrize('pk', ['abc', '1.5', '999999'])
+def test_missing_recipe_is_not_found(anon_client, client, pk):
+    assert anon_client.get(f'/api/recipes/{pk}/').status_code == 404
+    assert client.get(f'/api/recipes/{pk}/').status_code == 404
+
+
+def conditional_get(client, url, etag):
+    return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+
+def test_versions_are_shared_through_the_database(db, settings):
+    settings.VERSION_CACHE_TIMEOUT = 0
+
+    assert versions.get_version('recipes') == 0.0
+    assert not DataVersion.objects.exists()
+
+    versions.bump('recipes')
+
+    assert versions.get_version('recipes') == DataVersion.objects.get(
+        key=versions.version_key('recipes')
+    ).version > 0
+
+
+@pytest.mark.parametrize('url', ['/api/recipes/', '/api/tags/'])
+def test_bump_from_another_process_changes_etag(
+    anon_client, make_recipe, settings, url
+):
+    settings.VERSION_CACHE_TIMEOUT = 0
+    make_recipe()
+    etag = anon_client.get(url)['ETag']
+    assert conditional_get(anon_client, url, etag).status_code == 304
+
+    # Другой процесс (management-команда) меняет версию только в БД:
+    # его кэш в памяти веб-процессу не виден.
+    for parts in (('recipes',), catalog.version_parts(Tag)):
+        DataVersion.objects.update_or_create(
+            key=versions.version_key(*parts),
+            defaults={'version': time.time() + 1}
+        )
+
+    response = conditional_get(anon_client, url, etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_transaction_bumps_versions_with_one_query(
+    db, django_capture_on_commit_callbacks, django_assert_num_queries
+):
+    with django_capture_on_commit_callbacks() as callbacks:
+        for _ in range(3):
+            versions.bump_on_commit('recipes')
+            versions.bump_on_commit('user-state', 1)
+
+    with django_assert_num_queries(1):
+        for callback in callbacks:
+            callback()
+
+    assert {
+        versions.version_key('recipes'), versions.version_key('user-state', 1)
+    } <= set(DataVersion.objects.values_list('key', flat=True))
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes import versions
+from recipes.models import (
+    Favorite, Follow, IngredientRecipe, Recipe, ShoppingList, User
+)
+
+
+def counters(recipe, author):
+    recipe = Recipe.objects.get(pk=recipe.pk)
+    author = User.objects.get(pk=author.pk)
+    return {
+        'favorites': recipe.favorites_count,
+        'shopping': recipe.shopping_count,
+        'ingredients': recipe.ingredients_count,
+        'recipes': author.recipes_count,
+        'followers': author.followers_count,
+    }
+
+
+def test_counters_follow_related_objects(user, author, make_recipe):
+    recipe = make_recipe(count=3)
+    favorite = Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+
+    assert counters(recipe, author) == {
+        'favorites': 1, 'shopping': 1, 'ingredients': 3,
+        'recipes': 1, 'followers': 1,
+    }
+
+    favorite.delete()
+    ShoppingList.objects.filter(user=user).delete()
+    Follow.objects.filter(user=user).delete()
+    IngredientRecipe.objects.filter(recipe=recipe).first().delete()
+
+    assert counters(recipe, author) == {
+        'favorites': 0, 'shopping': 0, 'ingredients': 2,
+        'recipes': 1, 'followers': 0,
+    }
+
+
+def test_recipe_delete_updates_author_counter(author, make_recipe):
+    recipe = make_recipe()
+    make_recipe()
+
+    recipe.delete()
+
+    assert User.objects.get(pk=author.pk).recipes_count == 1
+
+
+def test_recount_repairs_counters(user, author, make_recipe, settings):
+    settings.VERSION_CACHE_TIMEOUT = 0
+    recipe = make_recipe(count=2)
+    Favorite.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+    Recipe.objects.update(
+        favorites_count=5, shopping_count=5, ingredients_count=0
+    )
+    User.objects.update(recipes_count=0, followers_count=7)
+    users_version = versions.get_version('users')
+
+    call_command('recount', stdout=StringIO())
+
+    assert counters(recipe, author) == {
+        'favorites': 1, 'shopping': 0, 'ingredients': 2,
+        'recipes': 1, 'followers': 1,
+    }
+    assert versions.get_version('users') > users_version
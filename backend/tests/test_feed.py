@@ -0,0 +1,73 @@
+import time
+
+from recipes import versions
+from recipes.models import DataVersion, Follow, Recipe
+
+FEED = '/api/users/feed/'
+
+
+def feed_names(client):
+    response = client.get(FEED)
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+def test_feed_is_refreshed_when_followed_author_publishes_and_edits(
+    client, author_client, user, author, ingredients, recipe_payload,
+    django_capture_on_commit_callbacks
+):
+    Follow.objects.create(user=user, author=author)
+    assert feed_names(client) == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            '/api/recipes/', recipe_payload(ingredients[:2], name='Борщ'),
+            format='json'
+        )
+    assert response.status_code == 201
+    assert feed_names(client) == ['Борщ']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.patch(
+            f'/api/recipes/{response.data["id"]}/',
+            recipe_payload(ingredients[:2], name='Щи'), format='json'
+        )
+    assert response.status_code == 200
+    assert feed_names(client) == ['Щи']
+
+
+def test_feed_is_refreshed_after_change_in_another_process(
+    client, user, author, make_recipe, settings
+):
+    settings.VERSION_CACHE_TIMEOUT = 0
+    Follow.objects.create(user=user, author=author)
+    recipe = make_recipe()
+    assert feed_names(client) == ['Суп']
+
+    # Рецепт изменён в другом воркере: меняются только строки в БД,
+    # кэш этого процесса никто не сбрасывает.
+    Recipe.objects.filter(pk=recipe.pk).update(name='Щи')
+    DataVersion.objects.update_or_create(
+        key=versions.version_key('recipes'),
+        defaults={'version': time.time() + 1}
+    )
+
+    assert feed_names(client) == ['Щи']
+
+
+def test_feed_head_is_cached_per_host(
+    client, user, author, make_recipe, settings
+):
+    settings.ALLOWED_HOSTS = ['*']
+    Follow.objects.create(user=user, author=author)
+    make_recipe(image='recipes/images/picture.png')
+
+    images = [
+        client.get(FEED, HTTP_HOST=host).data['results'][0]['image']
+        for host in ('one.example', 'two.example')
+    ]
+
+    assert images == [
+        f'http://{host}{settings.MEDIA_URL}recipes/images/picture.png'
+        for host in ('one.example', 'two.example')
+    ]
@@ -0,0 +1,76 @@
+import base64
+
+import pytest
+from django.core.management import call_command
+from PIL import Image
+
+from api.serializers import Base64ImageField
+from recipes import images
+from recipes.models import Recipe
+from recipes.storage import content_storage
+
+
+def test_base64_image_is_decoded_in_chunks(monkeypatch, png_image):
+    monkeypatch.setattr(Base64ImageField, 'chunk_size', 8)
+
+    file = Base64ImageField().to_internal_value(png_image)
+
+    file.seek(0)
+    assert file.read() == base64.b64decode(png_image.partition(',')[2])
+    assert file.name.endswith('.png')
+
+
+@pytest.mark.parametrize('image', (
+    'data:image/png;base64,@@@@',
+    'data:image/png,iVBORw0KGgo=',
+    'data:image/png;base64,' + base64.b64encode(b'not an image').decode(),
+))
+def test_malformed_image_is_rejected(
+    author_client, recipe_payload, ingredients, image
+):
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(ingredients[:1], image=image),
+        format='json'
+    )
+
+    assert response.status_code == 400
+    assert 'image' in response.data
+    assert not Recipe.objects.exists()
+
+
+def test_image_variants_are_created_outside_request(
+    author_client, recipe_payload, ingredients, png_image, image_tasks
+):
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(ingredients[:1], image=png_image),
+        format='json'
+    )
+    assert response.status_code == 201
+    assert image_tasks == [response.data['id']]
+    assert not Recipe.objects.get(pk=response.data['id']).image_webp
+
+    images.process_recipe_image(response.data['id'])
+
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    for field in ('image_thumbnail', 'image_webp'):
+        name = getattr(recipe, field).name
+        assert name.endswith('.webp')
+        with content_storage.open(name) as file:
+            assert Image.open(file).format == 'WEBP'
+    response = author_client.get(f'/api/recipes/{recipe.id}/')
+    assert response.data['image_webp'].endswith(recipe.image_webp.name)
+
+
+def test_pending_images_are_processed_by_command(
+    author_client, recipe_payload, ingredients, png_image, capsys
+):
+    response = author_client.post(
+        '/api/recipes/', recipe_payload(ingredients[:1], image=png_image),
+        format='json'
+    )
+    assert response.status_code == 201
+
+    call_command('process_recipe_images')
+
+    assert 'Processed images: 1' in capsys.readouterr().out
+    assert Recipe.objects.get(pk=response.data['id']).image_webp
@@ -0,0 +1,62 @@
+from recipes import ingredient_index
+from recipes.models import IngredientIndex, Recipe
+
+
+def postings(ingredient):
+    row = IngredientIndex.objects.filter(ingredient=ingredient).first()
+    return None if row is None else list(ingredient_index.decode(row.postings))
+
+
+def test_update_applies_changes_to_postings(ingredients, make_recipe):
+    salt, pepper = ingredients[:2]
+    first, second, third = (make_recipe(count=0) for _ in range(3))
+
+    ingredient_index.update(second.id, added=[salt.id, pepper.id])
+    ingredient_index.update(third.id, added=[salt.id])
+    ingredient_index.update(first.id, added=[salt.id])
+
+    assert postings(salt) == [first.id, second.id, third.id]
+    assert postings(pepper) == [second.id]
+
+    ingredient_index.update(second.id, removed=[salt.id, pepper.id])
+    ingredient_index.update(second.id, removed=[salt.id])
+
+    assert postings(salt) == [first.id, third.id]
+    assert postings(pepper) is None
+
+
+def test_rank_reads_ingredient_counts_at_query_time(
+    ingredients, make_recipe
+):
+    small = make_recipe(count=2)
+    large = make_recipe(count=4)
+    ingredient_index.rebuild()
+
+    assert ingredient_index.rank([ingredients[0].id, ingredients[1].id]) == [
+        (small.id, 2, 2), (large.id, 2, 4)
+    ]
+
+    Recipe.objects.filter(pk=small.pk).update(ingredients_count=8)
+
+    assert ingredient_index.rank([ingredients[0].id, ingredients[1].id]) == [
+        (large.id, 2, 4), (small.id, 2, 8)
+    ]
+
+
+def test_what_to_cook_ranks_by_coverage(
+    anon_client, ingredients, make_recipe, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        small = make_recipe(count=2)
+        large = make_recipe(count=6)
+
+    response = anon_client.get(
+        '/api/recipes/what_to_cook/',
+        {'ingredients': f'{ingredients[0].id},{ingredients[1].id}'}
+    )
+
+    assert response.status_code == 200
+    assert [
+        (recipe['id'], recipe['matched_count'], recipe['coverage'])
+        for recipe in response.json()['results']
+    ] == [(small.id, 2, 1.0), (large.id, 2, 0.3333)]
@@ -0,0 +1,34 @@
+import pytest
+
+from recipes.models import Ingredient
+
+
+@pytest.fixture
+def vegetables(db):
+    for name in ('молодой картофель', 'картофель', 'карри', 'морковь'):
+        Ingredient.objects.create(name=name, measurement_unit='г')
+
+
+def names(client, params):
+    response = client.get('/api/ingredients/', params)
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.data]
+
+
+def test_name_filter_matches_start_ignoring_case(anon_client, vegetables):
+    assert names(anon_client, {'name': 'КАР'}) == ['карри', 'картофель']
+
+
+def test_search_ranks_prefix_matches_first(anon_client, vegetables):
+    assert names(anon_client, {'search': 'Картоф'}) == [
+        'картофель', 'молодой картофель'
+    ]
+
+
+@pytest.mark.parametrize('limit, expected', (
+    ('1', ['картофель']),
+    ('5', ['картофель', 'молодой картофель']),
+    ('abc', ['картофель', 'молодой картофель']),
+))
+def test_limit_caps_autocomplete(anon_client, vegetables, limit, expected):
+    assert names(anon_client, {'search': 'картоф', 'limit': limit}) == expected
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.management.commands import load_ingredient_data
+from recipes.models import Ingredient
+
+ROWS = [
+    {'name': 'соль', 'measurement_unit': 'г'},
+    {'name': 'сахар', 'measurement_unit': 'г'},
+    {'name': 'соль', 'measurement_unit': 'г'},
+    {'name': 'молоко', 'measurement_unit': 'мл'},
+    {'name': 'молоко', 'measurement_unit': 'стакан'},
+]
+LOADED = {
+    ('молоко', 'мл'), ('молоко', 'стакан'), ('сахар', 'г'), ('соль', 'г')
+}
+
+
+def loaded():
+    return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+
+def load(path, capsys, **options):
+    call_command('load_ingredient_data', path=str(path), **options)
+    return capsys.readouterr().out
+
+
+def test_csv_is_loaded_in_batches_without_duplicates(db, tmp_path, capsys):
+    Ingredient.objects.create(name='сахар', measurement_unit='г')
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('name,measurement_unit\n' + ''.join(
+        f'{row["name"]},{row["measurement_unit"]}\n' for row in ROWS
+    ), encoding='utf8')
+
+    output = load(path, capsys, batch_size=2)
+
+    assert loaded() == LOADED
+    assert '5 rows read, 4 unique, 3 created' in output
+    assert '0 created' in load(path, capsys)
+    assert loaded() == LOADED
+
+
+def test_json_is_streamed_across_chunks(db, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(load_ingredient_data, 'CHUNK_SIZE', 16)
+    path = tmp_path / 'ingredients.json'
+    path.write_text(
+        json.dumps(ROWS, ensure_ascii=False, indent=2), encoding='utf8'
+    )
+
+    output = load(path, capsys)
+
+    assert loaded() == LOADED
+    assert '5 rows read, 4 unique, 4 created' in output
+
+
+@pytest.mark.parametrize('filename, content', (
+    ('ingredients.json', '{"name": "соль"}'),
+    ('ingredients.json', '[{"name": "соль", "measurement_unit": '),
+    ('ingredients.xml', '<ingredients/>'),
+))
+def test_invalid_files_are_rejected(db, tmp_path, capsys, filename, content):
+    path = tmp_path / filename
+    path.write_text(content, encoding='utf8')
+
+    with pytest.raises(CommandError):
+        load(path, capsys)
+    assert not Ingredient.objects.exists()
@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from recipes import images
+from recipes.storage import content_storage
+
+
+def save(content, directory='recipes/images'):
+    return content_storage.save(
+        f'{directory}/image.png', ContentFile(content)
+    )
+
+
+def make_old(name, seconds=2 * 60 * 60):
+    moment = time.time() - seconds
+    os.utime(content_storage.path(name), (moment, moment))
+
+
+def test_same_content_is_saved_once_and_refreshed(db):
+    name = save(b'picture')
+    make_old(name)
+
+    assert save(b'picture') == name
+    assert content_storage.age(name) < 60
+    assert content_storage.listdir('recipes/images')[1] == [
+        os.path.basename(name)
+    ]
+
+
+def test_release_deletes_only_unreferenced_old_files(make_recipe):
+    shared, orphan, fresh = save(b'shared'), save(b'orphan'), save(b'fresh')
+    for name in (shared, orphan):
+        make_old(name)
+    make_recipe(image=shared)
+
+    images.release([shared, orphan, fresh])
+
+    assert content_storage.exists(shared)
+    assert not content_storage.exists(orphan)
+    assert content_storage.exists(fresh)
+
+
+def test_release_keeps_file_reused_after_references_were_read(
+    make_recipe, settings
+):
+    settings.IMAGE_RELEASE_MIN_AGE = 60
+    name = save(b'picture')
+    make_old(name)
+    # Другой рецепт загрузил то же изображение, но ещё не зафиксирован.
+    save(b'picture')
+
+    images.release([name])
+
+    assert content_storage.exists(name)
+
+
+@pytest.mark.parametrize('dry_run', (False, True))
+def test_collect_media_garbage(make_recipe, capsys, dry_run):
+    used = save(b'used')
+    variant = save(b'variant', 'recipes/images/variants')
+    orphan_variant = save(b'orphan variant', 'recipes/images/variants')
+    orphan, fresh = save(b'orphan'), save(b'fresh')
+    for name in (used, variant, orphan_variant, orphan):
+        make_old(name)
+    make_recipe(image=used, image_webp=variant)
+
+    call_command('collect_media_garbage', dry_run=dry_run)
+
+    assert 'Deleted files: 2' in capsys.readouterr().out
+    for name in (used, variant, fresh):
+        assert content_storage.exists(name)
+    for name in (orphan, orphan_variant):
+        assert content_storage.exists(name) is dry_run
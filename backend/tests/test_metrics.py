@@ -0,0 +1,32 @@
+import re
+
+from api.serializers import TagSerializer
+from backend.metrics import registry
+
+TIMING = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+def test_serialization_is_timed_separately(client, make_recipe):
+    for _ in range(3):
+        make_recipe()
+    registry.reset()
+
+    response = client.get('/api/recipes/')
+
+    assert response.status_code == 200
+    timings = {
+        name: float(value)
+        for name, value in TIMING.findall(response['Server-Timing'])
+    }
+    assert set(timings) == {'db', 'app', 'serialize', 'render', 'total'}
+    assert 0 < timings['serialize'] <= timings['total']
+    metrics = registry.views['api:recipe-list', 'GET']
+    assert 0 < metrics.serialize_seconds <= metrics.seconds
+    assert (
+        'http_request_serialize_seconds_total'
+        '{view="api:recipe-list",method="GET"}'
+    ) in registry.render()
+
+
+def test_serialization_outside_request_is_not_timed(tag):
+    assert TagSerializer(tag).data['slug'] == tag.slug
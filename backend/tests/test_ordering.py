@@ -0,0 +1,51 @@
+import pytest
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, RecipeScore
+
+
+@pytest.fixture
+def scored_recipes(make_recipe):
+    recipes = [make_recipe(count=1) for _ in range(4)]
+    for recipe, popular, trending in zip(
+        recipes, (5, 9, 5, 1), (3, 0, 7, 3)
+    ):
+        RecipeScore.objects.filter(recipe=recipe).update(
+            popular=popular, trending=trending
+        )
+    return recipes
+
+
+@pytest.mark.parametrize('ordering, expected', [
+    ('popular', [1, 2, 0, 3]),
+    ('trending', [2, 3, 0, 1]),
+])
+def test_recipes_ordered_by_score(
+    anon_client, scored_recipes, ordering, expected
+):
+    response = anon_client.get('/api/recipes/', {'ordering': ordering})
+
+    assert response.status_code == 200
+    assert [recipe['id'] for recipe in response.json()['results']] == [
+        scored_recipes[index].id for index in expected
+    ]
+
+
+def test_ordering_query_joins_scores_in_index_order(scored_recipes):
+    queryset = RecipeFilter(
+        {'ordering': 'popular'}, queryset=Recipe.objects.all()
+    ).qs
+    sql = str(queryset.query)
+
+    assert 'LEFT OUTER JOIN' not in sql
+    assert sql.endswith(
+        'ORDER BY "recipes_recipescore"."popular" DESC, '
+        '"recipes_recipescore"."recipe_id" DESC'
+    )
+
+
+def test_unknown_ordering_is_rejected(anon_client, scored_recipes):
+    response = anon_client.get('/api/recipes/', {'ordering': 'random'})
+
+    assert response.status_code == 400
+    assert 'ordering' in response.json()
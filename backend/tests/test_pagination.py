@@ -0,0 +1,51 @@
+from api.pagination import RecipeCursorPagination
+from recipes.models import Follow
+
+
+def walk(client, url, direction):
+    """Id рецептов на страницах, пройденных по ссылкам direction."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        pages.append([recipe['id'] for recipe in response.data['results']])
+        last = response.data
+        url = response.data[direction]
+    return pages, last
+
+
+def test_cursor_pagination_walks_recipes_both_ways(client, make_recipe):
+    ids = sorted((make_recipe(count=1).id for _ in range(5)), reverse=True)
+
+    pages, last = walk(
+        client, '/api/recipes/?pagination=cursor&limit=2', 'next'
+    )
+    assert pages == [ids[:2], ids[2:4], ids[4:]]
+
+    pages, _ = walk(client, last['previous'], 'previous')
+    assert pages == [ids[2:4], ids[:2]]
+
+
+def test_cursor_pagination_limit_is_capped(
+    anon_client, make_recipe, monkeypatch
+):
+    monkeypatch.setattr(RecipeCursorPagination, 'max_page_size', 2)
+    for _ in range(3):
+        make_recipe(count=1)
+
+    response = anon_client.get('/api/recipes/?pagination=cursor&limit=500')
+
+    assert response.status_code == 200
+    assert len(response.data['results']) == 2
+    assert response.data['next'] is not None
+    assert response.data['previous'] is None
+
+
+def test_feed_uses_cursor_pagination(client, user, author, make_recipe):
+    Follow.objects.create(user=user, author=author)
+    ids = sorted((make_recipe(count=1).id for _ in range(3)), reverse=True)
+
+    pages, _ = walk(client, '/api/users/feed/?limit=2', 'next')
+
+    assert pages == [ids[:2], ids[2:]]
@@ -0,0 +1,115 @@
+import re
+
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Follow, ShoppingList, User
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+@pytest.fixture
+def token_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    return client
+
+
+@pytest.fixture
+def catalog_data(user, author, tag, ingredients, make_recipe):
+    others = [
+        User.objects.create_user(
+            email=f'other{number}@example.com', username=f'other{number}',
+            password='password', first_name='Имя', last_name='Фамилия'
+        )
+        for number in range(3)
+    ]
+    recipes = [
+        make_recipe(count=5, author=owner)
+        for owner in [author, *others] for _ in range(3)
+    ]
+    for owner in [author, *others]:
+        Follow.objects.create(user=user, author=owner)
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    return recipes
+
+
+def measure(client, method, url, data=None):
+    """Ответ, ключ бюджета запроса и число выполненных им SQL-запросов."""
+    response = getattr(client, method.lower())(url, data, format='json')
+    assert response.status_code < 300, (url, response.content)
+    view = response.wsgi_request.resolver_match.view_name
+    return (
+        response,
+        f'{method} {view}',
+        int(QUERIES.search(response['Server-Timing'])[1])
+    )
+
+
+# Транзакционный режим: обработчики on_commit выполняются внутри запроса,
+# как в работающем приложении, и их запросы тоже попадают в бюджет.
+# Версии данных не кэшируются: бюджет должен покрывать и запрос,
+# в котором кэш версий истёк.
+@pytest.mark.django_db(transaction=True)
+def test_views_stay_within_query_budgets(
+    token_client, anon_client, author, tag, ingredients, catalog_data,
+    recipe_payload, png_image, settings
+):
+    settings.VERSION_CACHE_TIMEOUT = 0
+    recipe = catalog_data[0]
+    response, key, count = measure(
+        token_client, 'POST', '/api/recipes/',
+        recipe_payload(ingredients[:6], amount=2, image=png_image)
+    )
+    counts = {key: count}
+    own = response.json()['id']
+    ShoppingList.objects.create(user=author, recipe_id=own)
+    requests = [
+        (token_client, 'GET', '/api/recipes/'),
+        (token_client, 'GET', '/api/recipes/?tags=breakfast&is_favorited=1'),
+        (token_client, 'GET', f'/api/recipes/{recipe.id}/'),
+        (anon_client, 'GET', '/api/recipes/'),
+        (anon_client, 'GET', f'/api/recipes/{recipe.id}/'),
+        (token_client, 'GET',
+         f'/api/recipes/what_to_cook/?ingredients={ingredients[0].id}'),
+        (token_client, 'GET', '/api/recipes/shopping_cart_summary/'),
+        (token_client, 'GET', '/api/ingredients/?name=инг'),
+        (token_client, 'GET', f'/api/ingredients/{ingredients[0].id}/'),
+        (token_client, 'GET', '/api/tags/'),
+        (token_client, 'GET', f'/api/tags/{tag.id}/'),
+        (token_client, 'GET', '/api/users/'),
+        (token_client, 'GET', f'/api/users/{author.id}/'),
+        (token_client, 'GET', '/api/users/me/'),
+        (token_client, 'GET', '/api/users/subscriptions/'),
+        (token_client, 'GET', '/api/users/feed/'),
+        (token_client, 'POST', '/api/recipes/',
+         recipe_payload(ingredients[:8], amount=2, image=png_image)),
+        (token_client, 'PATCH', f'/api/recipes/{own}/',
+         recipe_payload(ingredients[4:10], amount=2, image=png_image)),
+        (token_client, 'DELETE', f'/api/recipes/{own}/'),
+    ]
+    recipe_ids = {'ids': [item.id for item in catalog_data]}
+    author_ids = {'ids': [item.author_id for item in catalog_data]}
+    for url, data in (
+        ('/api/recipes/favorite_batch/', recipe_ids),
+        ('/api/recipes/shopping_cart_batch/', recipe_ids),
+        ('/api/users/subscribe_batch/', author_ids),
+    ):
+        requests += [
+            (token_client, 'DELETE', url, data),
+            (token_client, 'POST', url, data),
+        ]
+    for client, method, url, *data in requests:
+        _, key, count = measure(client, method, url, *data)
+        counts[key] = max(counts.get(key, 0), count)
+
+    assert set(counts) <= set(settings.QUERY_BUDGETS)
+    assert {
+        key: count for key, count in counts.items()
+        if count > settings.QUERY_BUDGETS[key]
+    } == {}, counts
@@ -0,0 +1,101 @@
+import pytest
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import APIFeed, APIMyUser, RecipeViewSet
+from recipes.models import Favorite, Follow, ShoppingList
+
+# Для каждого индекса - имена, любое из которых допустимо в плане.
+# Флаги рецептов строки проверяют по пользователю и рецепту, и для них
+# подходит и уникальный индекс из unique_together: Django называет его
+# одинаково во всех СУБД, поэтому он сравнивается по началу имени.
+# Выборки по пользователю обслуживают только индексы user_*.
+FAVORITE = ('favorite_user_recipe_idx', 'recipes_favorite_recipe_id_user_id')
+CART = (
+    'shoppinglist_user_recipe_idx', 'recipes_shoppinglist_recipe_id_user_id'
+)
+FOLLOW = ('follow_user_author_idx', 'recipes_follow_author_id_user_id')
+USER_FAVORITES = ('favorite_user_recipe_idx',)
+USER_CART = ('shoppinglist_user_recipe_idx',)
+USER_FOLLOWS = ('follow_user_author_idx',)
+# SQLite хранит уникальные ограничения как autoindex.
+TAG_RECIPE = (
+    'tagrecipe_tag_recipe_uniq', 'sqlite_autoindex_recipes_tagrecipe'
+)
+AUTHOR = ('recipe_author_id_idx',)
+POPULAR = ('recipescore_popular_idx',)
+TRENDING = ('recipescore_trending_idx',)
+
+RECIPES = {'action_map': {'get': 'list'}}
+
+PLANS = (
+    (RecipeViewSet, RECIPES, '/api/recipes/', (FAVORITE, CART)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?tags=breakfast',
+     (TAG_RECIPE, FAVORITE, CART)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?is_favorited=1',
+     (USER_FAVORITES,)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?is_in_shopping_cart=1',
+     (USER_CART,)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?author={author}', (AUTHOR,)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?ordering=popular', (POPULAR,)),
+    (RecipeViewSet, RECIPES, '/api/recipes/?ordering=trending', (TRENDING,)),
+    (APIFeed, {}, '/api/users/feed/', (FOLLOW, FAVORITE, CART)),
+    (APIMyUser, {}, '/api/users/subscriptions/', (USER_FOLLOWS,)),
+)
+
+
+@pytest.fixture
+def seeded(user, author, make_recipe):
+    recipes = [make_recipe() for _ in range(10)]
+    Follow.objects.create(user=user, author=author)
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    if connection.vendor == 'postgresql':
+        # На маленьких таблицах PostgreSQL выбирает последовательное
+        # чтение, даже когда подходящий индекс есть.
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+    return recipes
+
+
+def view_queryset(view_class, attrs, user, url):
+    """Запрос, который представление выполнит для GET url."""
+    request = APIRequestFactory().get(url)
+    force_authenticate(request, user)
+    view = view_class(**attrs)
+    view.args, view.kwargs, view.format_kwarg = (), {}, None
+    view.request = view.initialize_request(request)
+    return view.filter_queryset(view.get_queryset())
+
+
+def assert_uses(plan, indexes):
+    for alternatives in indexes:
+        assert any(index in plan for index in alternatives), (
+            alternatives, plan
+        )
+
+
+@pytest.mark.parametrize(
+    'view_class, attrs, url, indexes', PLANS,
+    ids=[f'{plan[0].__name__} {plan[2]}' for plan in PLANS]
+)
+def test_view_queries_use_indexes(
+    seeded, user, author, view_class, attrs, url, indexes
+):
+    queryset = view_queryset(
+        view_class, attrs, user, url.format(author=author.id)
+    )
+
+    assert_uses(queryset.explain(), indexes)
+
+
+def test_subscription_recipes_use_author_index(seeded, user, author):
+    queryset = view_queryset(
+        APIMyUser, {}, user, '/api/users/subscriptions/'
+    )
+    lookup, = queryset._prefetch_related_lookups
+
+    assert_uses(
+        lookup.queryset.filter(author__in=[author.id]).explain(), (AUTHOR,)
+    )
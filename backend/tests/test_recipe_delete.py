@@ -0,0 +1,84 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes import ingredient_index
+from recipes.models import (
+    Favorite, IngredientIndex, Recipe, ShoppingList, User
+)
+
+
+@pytest.fixture
+def shoppers(db):
+    return [
+        User.objects.create_user(
+            email=f'shopper{number}@example.com',
+            username=f'shopper{number}', password='password',
+            first_name='Имя', last_name='Фамилия'
+        )
+        for number in range(10)
+    ]
+
+
+def make_shared_recipe(make_recipe, pantry, users):
+    recipe = make_recipe(count=0)
+    recipe.recipe_ingredients.bulk_create(
+        recipe.recipe_ingredients.model(
+            recipe=recipe, ingredients=ingredient, amount=2
+        )
+        for ingredient in pantry
+    )
+    for user in users:
+        Favorite.objects.create(user=user, recipe=recipe)
+        ShoppingList.objects.create(user=user, recipe=recipe)
+    return recipe
+
+
+def delete(client, recipe, capture):
+    with CaptureQueriesContext(connection) as queries:
+        with capture(execute=True):
+            response = client.delete(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 204, response.content
+    return len(queries)
+
+
+def test_delete_queries_do_not_depend_on_cascade(
+    author_client, make_recipe, pantry, shoppers,
+    django_capture_on_commit_callbacks
+):
+    small = make_shared_recipe(make_recipe, pantry[:2], shoppers[:1])
+    # 40 ингредиентов у 8 покупателей - одна пачка изменений сумм
+    # даже с ограничением SQLite на число параметров запроса.
+    large = make_shared_recipe(make_recipe, pantry[:40], shoppers[:8])
+    ingredient_index.rebuild()
+
+    assert delete(
+        author_client, small, django_capture_on_commit_callbacks
+    ) == delete(author_client, large, django_capture_on_commit_callbacks)
+
+
+def test_delete_keeps_derived_data_consistent(
+    author_client, author, make_recipe, pantry, shoppers,
+    django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        kept = make_recipe(count=0)
+        kept.recipe_ingredients.create(ingredients=pantry[0], amount=3)
+    removed = make_shared_recipe(make_recipe, pantry[:3], shoppers[:2])
+    ingredient_index.rebuild()
+    ShoppingList.objects.create(user=shoppers[0], recipe=kept)
+
+    delete(author_client, removed, django_capture_on_commit_callbacks)
+
+    assert list(Recipe.objects.values_list('id', flat=True)) == [kept.id]
+    assert User.objects.get(pk=author.pk).recipes_count == 1
+    assert dict(
+        shoppers[0].cart_totals.values_list('ingredient_id', 'amount')
+    ) == {pantry[0].id: 3}
+    assert not shoppers[1].cart_totals.exists()
+    assert list(ingredient_index.decode(IngredientIndex.objects.get(
+        ingredient=pantry[0]
+    ).postings)) == [kept.id]
+    assert not IngredientIndex.objects.filter(
+        ingredient__in=pantry[1:3]
+    ).exists()
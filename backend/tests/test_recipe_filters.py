@@ -0,0 +1,24 @@
+from recipes.models import Tag
+
+
+def test_recipe_with_several_requested_tags_is_listed_once(
+    anon_client, client, make_recipe
+):
+    lunch = Tag.objects.create(name='Обед', slug='lunch', color='#222')
+    dinner = Tag.objects.create(name='Ужин', slug='dinner', color='#333')
+    both = make_recipe()
+    both.tags.add(lunch)
+    only_lunch = make_recipe()
+    only_lunch.tags.set([lunch])
+    make_recipe().tags.set([dinner])
+
+    for api_client in (anon_client, client):
+        response = api_client.get(
+            '/api/recipes/', {'tags': ['breakfast', 'lunch']}
+        )
+
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+        assert sorted(
+            recipe['id'] for recipe in response.data['results']
+        ) == [both.id, only_lunch.id]
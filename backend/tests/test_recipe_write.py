@@ -0,0 +1,63 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes import ingredient_index
+from recipes.models import (
+    IngredientIndex, IngredientRecipe, Recipe, ShoppingList
+)
+
+
+def update(client, recipe_id, data):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.patch(
+            f'/api/recipes/{recipe_id}/', data, format='json'
+        )
+    assert response.status_code == 200, response.content
+    return len(queries)
+
+
+def create(client, data):
+    response = client.post('/api/recipes/', data, format='json')
+    assert response.status_code == 201, response.content
+    return response.json()['id']
+
+
+def test_update_queries_do_not_depend_on_replaced_ingredients(
+    author_client, user, pantry, recipe_payload
+):
+    first = create(author_client, recipe_payload(pantry[:40]))
+    second = create(author_client, recipe_payload(pantry[:40]))
+    for recipe_id in (first, second):
+        ShoppingList.objects.create(user=user, recipe_id=recipe_id)
+
+    few = update(author_client, first, recipe_payload(pantry[2:42]))
+    many = update(author_client, second, recipe_payload(pantry[20:60]))
+
+    assert few == many
+
+
+def test_update_keeps_derived_data_consistent(
+    author_client, user, pantry, recipe_payload,
+    django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe_id = create(author_client, recipe_payload(pantry[:5]))
+    ShoppingList.objects.create(user=user, recipe_id=recipe_id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        update(author_client, recipe_id, recipe_payload(pantry[3:6], amount=4))
+
+    recipe = Recipe.objects.get(id=recipe_id)
+    assert recipe.ingredients_count == 3
+    assert set(IngredientRecipe.objects.filter(
+        recipe=recipe
+    ).values_list('ingredients_id', flat=True)) == {
+        ingredient.id for ingredient in pantry[3:6]
+    }
+    assert not IngredientIndex.objects.filter(ingredient=pantry[0]).exists()
+    assert list(ingredient_index.decode(IngredientIndex.objects.get(
+        ingredient=pantry[5]
+    ).postings)) == [recipe_id]
+    assert dict(user.cart_totals.values_list('ingredient_id', 'amount')) == {
+        ingredient.id: 4 for ingredient in pantry[3:6]
+    }
@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+
+from api.views import recipe_queryset
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+
+@pytest.fixture
+def indexed(django_capture_on_commit_callbacks):
+    """Выполняет обновление поискового индекса после фиксации."""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def search(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+def test_search_ranks_name_over_ingredients_over_text(
+    anon_client, make_recipe, indexed
+):
+    with indexed():
+        make_recipe(name='Фасоль тушёная')
+        recipe = make_recipe(name='Суп')
+        IngredientRecipe.objects.create(
+            recipe=recipe, amount=1, ingredients=Ingredient.objects.create(
+                name='фасоль', measurement_unit='г'
+            )
+        )
+        make_recipe(name='Рагу', text='Можно добавить фасоли')
+        make_recipe(name='Каша')
+
+    assert search(anon_client, 'фасол') == ['Фасоль тушёная', 'Суп', 'Рагу']
+    assert search(anon_client, 'фасоль суп') == ['Суп']
+    assert search(anon_client, '!!!') == []
+
+
+def test_renamed_recipe_is_reindexed(anon_client, make_recipe, indexed):
+    with indexed():
+        recipe = make_recipe(name='Борщ')
+    with indexed():
+        recipe.name = 'Щи'
+        recipe.save()
+
+    assert search(anon_client, 'борщ') == []
+    assert search(anon_client, 'щи') == ['Щи']
+
+
+def test_renamed_ingredient_is_reindexed(
+    anon_client, make_recipe, ingredients, indexed
+):
+    with indexed():
+        make_recipe(name='Суп', count=1)
+    with indexed():
+        ingredients[0].name = 'картофель'
+        ingredients[0].save()
+
+    assert search(anon_client, 'картофель') == ['Суп']
+    assert search(anon_client, 'ингредиент') == []
+
+
+def test_recipe_responses_do_not_load_search_vector(db):
+    sql = str(recipe_queryset(AnonymousUser()).query)
+
+    assert Recipe._meta.get_field('search_vector').column not in sql
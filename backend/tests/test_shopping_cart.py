@@ -0,0 +1,51 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import ShoppingList
+
+
+def download(client, file_format='txt'):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(
+            f'/api/recipes/download_shopping_cart/?file_format={file_format}'
+        )
+        content = b''.join(response.streaming_content).decode()
+    return response, content, len(queries)
+
+
+def test_download_sums_ingredients(client, user, make_recipe):
+    for _ in range(3):
+        ShoppingList.objects.create(user=user, recipe=make_recipe())
+
+    response, content, _ = download(client)
+
+    assert response.status_code == 200
+    assert 'ингредиент 0 - 3 г' in content
+    assert 'ингредиент 2 - 9 г' in content
+
+
+def test_download_queries_do_not_depend_on_cart_size(
+    client, user, make_recipe
+):
+    ShoppingList.objects.create(user=user, recipe=make_recipe())
+    _, small, small_queries = download(client)
+    for _ in range(10):
+        ShoppingList.objects.create(user=user, recipe=make_recipe(count=10))
+    _, large, large_queries = download(client)
+
+    assert small.count('\n') < large.count('\n')
+    assert large_queries == small_queries == 1
+
+
+def test_download_csv_and_unknown_format(client, user, make_recipe):
+    ShoppingList.objects.create(user=user, recipe=make_recipe(count=1))
+
+    response, content, _ = download(client, 'csv')
+
+    assert response['Content-Type'].startswith('text/csv')
+    assert content.splitlines() == [
+        'name,amount,measurement_unit', 'ингредиент 0,1,г'
+    ]
+    assert client.get(
+        '/api/recipes/download_shopping_cart/?file_format=pdf'
+    ).status_code == 400
@@ -0,0 +1,85 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Follow, User
+
+
+def test_subscriptions_mark_authors_as_subscribed(
+    client, user, author, make_recipe
+):
+    make_recipe()
+    Follow.objects.create(user=user, author=author)
+
+    response = client.get('/api/users/subscriptions/')
+
+    assert response.status_code == 200
+    [item] = response.json()['results']
+    assert item['id'] == author.id
+    assert item['is_subscribed'] is True
+    assert item['recipes_count'] == 1
+    assert len(item['recipes']) == 1
+
+
+def follow_authors(user, make_recipe, count, prefix='writer'):
+    """Авторы, на которых подписан user; у n-го автора n + 1 рецептов."""
+    authors = []
+    for number in range(count):
+        author = User.objects.create_user(
+            email=f'{prefix}{number}@example.com',
+            username=f'{prefix}{number}',
+            password='password', first_name='Имя', last_name='Фамилия'
+        )
+        Follow.objects.create(user=user, author=author)
+        for _ in range(number + 1):
+            make_recipe(count=1, author=author)
+        authors.append(author)
+    return authors
+
+
+def test_subscriptions_show_newest_recipes_up_to_limit(
+    client, user, make_recipe
+):
+    authors = follow_authors(user, make_recipe, 3)
+
+    response = client.get('/api/users/subscriptions/?recipes_limit=2')
+
+    assert response.status_code == 200
+    items = {item['id']: item for item in response.json()['results']}
+    for author in authors:
+        newest = list(author.recipes.values_list('id', flat=True)[:2])
+        assert [
+            recipe['id'] for recipe in items[author.id]['recipes']
+        ] == newest
+        assert items[author.id]['recipes_count'] == author.recipes.count()
+
+
+@pytest.mark.parametrize('value, shown', (('0', 0), ('abc', 3), ('-1', 0)))
+def test_subscriptions_recipes_limit_values(
+    client, user, make_recipe, value, shown
+):
+    follow_authors(user, make_recipe, 4)
+
+    response = client.get(
+        '/api/users/subscriptions/', {'recipes_limit': value}
+    )
+
+    assert response.status_code == 200
+    [*_, item] = sorted(
+        response.json()['results'], key=lambda item: item['recipes_count']
+    )
+    assert len(item['recipes']) == shown
+
+
+def test_subscriptions_query_count_does_not_grow_with_authors(
+    client, user, make_recipe
+):
+    follow_authors(user, make_recipe, 2)
+    with CaptureQueriesContext(connection) as few:
+        client.get('/api/users/subscriptions/')
+    follow_authors(user, make_recipe, 4, prefix='reader')
+    with CaptureQueriesContext(connection) as many:
+        response = client.get('/api/users/subscriptions/')
+
+    assert response.json()['count'] == 6
+    assert len(many) == len(few)
@@ -0,0 +1,75 @@
+import pytest
+
+from recipes import versions
+
+
+@pytest.fixture
+def cached_etag(anon_client, make_recipe):
+    make_recipe()
+    response = anon_client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert anon_client.get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 304
+    return response['ETag']
+
+
+def is_fresh(client, etag):
+    return client.get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+
+
+def test_login_keeps_users_version(
+    anon_client, user, cached_etag, django_capture_on_commit_callbacks
+):
+    version = versions.get_version('users')
+    with django_capture_on_commit_callbacks(execute=True):
+        response = anon_client.post(
+            '/api/auth/token/login/',
+            {'email': user.email, 'password': 'password'}
+        )
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.last_login is not None
+    assert versions.get_version('users') == version
+    assert is_fresh(anon_client, cached_etag)
+
+
+def test_signup_keeps_users_version(
+    anon_client, cached_etag, django_capture_on_commit_callbacks
+):
+    version = versions.get_version('users')
+    with django_capture_on_commit_callbacks(execute=True):
+        response = anon_client.post('/api/users/', {
+            'email': 'new@example.com', 'username': 'new',
+            'first_name': 'Имя', 'last_name': 'Фамилия',
+            'password': 'Kx7pQ2mZr9wB',
+        })
+    assert response.status_code == 201
+    assert versions.get_version('users') == version
+    assert is_fresh(anon_client, cached_etag)
+
+
+def test_unchanged_profile_keeps_users_version(
+    author, anon_client, cached_etag, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        author.set_password('another')
+        author.save()
+    assert is_fresh(anon_client, cached_etag)
+
+
+@pytest.mark.parametrize('update_fields', [None, ['first_name']])
+def test_profile_change_bumps_users_version(
+    author, anon_client, cached_etag, django_capture_on_commit_callbacks,
+    update_fields
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        author.first_name = 'Другое'
+        author.save(update_fields=update_fields)
+    response = anon_client.get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=cached_etag
+    )
+    assert response.status_code == 200
+    assert response.json()['results'][0]['author']['first_name'] == 'Другое'
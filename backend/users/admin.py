@@ -5,6 +5,9 @@ from .models import MyUser
 
 @admin.register(MyUser)
 class MyUserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name')
+    list_display = (
+        'id', 'username', 'email', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
+    )
     search_fields = ('username', 'email')
     list_filter = ('username', 'email')
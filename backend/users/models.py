@@ -25,6 +25,8 @@ class MyUser(AbstractUser):
             RegexValidator(regex='^[a-zA-Z0-9]*$',),
         ],
     )
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']